@@ -1,6 +1,18 @@
+import os
+
+from budget import enforce_budget
+from checkpointing import create_checkpointer
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
+from observability import instrument_node
 from nodes import (
     AgentState,
+    aexaminer_node,
+    ahistory_node,
+    aplanner_node,
+    aresearcher_node,
+    asummarizer_node,
+    averified_summarizer_node,
     examiner_decision,
     examiner_node,
     history_node,
@@ -8,15 +20,46 @@ from nodes import (
     planner_node,
     researcher_node,
     summarizer_node,
+    summary_decision,
+    verified_summarizer_node,
 )
 
+
+def _node(name, func, afunc):
+    """Pair a sync node with its async twin so the graph serves invoke and ainvoke"""
+    return RunnableLambda(
+        instrument_node(name, enforce_budget(name, func)),
+        afunc=instrument_node(name, enforce_budget(name, afunc)),
+        name=func.__name__,
+    )
+
+
+GRAPH_NODES = ("planner", "research", "summarize", "examiner", "history")
+
+# "classic": summarizer then examiner on every answer. "combined": one
+# structured call writes the answer and judges it; the examiner only runs
+# when that verdict is not confident.
+GRAPH_VARIANT = os.getenv("GRAPH_VARIANT", "classic")
+if GRAPH_VARIANT not in ("classic", "combined"):
+    raise ValueError(f"Unknown GRAPH_VARIANT: {GRAPH_VARIANT}")
+
 builder = StateGraph(AgentState)
 
-builder.add_node("planner", planner_node)
-builder.add_node("research", researcher_node)
-builder.add_node("summarize", summarizer_node)
-builder.add_node("examiner", examiner_node)
-builder.add_node("history", history_node)
+builder.add_node("planner", _node("planner", planner_node, aplanner_node))
+builder.add_node(
+    "research", _node("research", researcher_node, aresearcher_node)
+)
+if GRAPH_VARIANT == "combined":
+    builder.add_node(
+        "summarize",
+        _node("summarize", verified_summarizer_node, averified_summarizer_node),
+    )
+else:
+    builder.add_node(
+        "summarize", _node("summarize", summarizer_node, asummarizer_node)
+    )
+builder.add_node("examiner", _node("examiner", examiner_node, aexaminer_node))
+builder.add_node("history", _node("history", history_node, ahistory_node))
 
 builder.set_entry_point("planner")
 builder.add_conditional_edges(
@@ -26,10 +69,26 @@ builder.add_conditional_edges(
 )
 
 builder.add_edge("research", "planner")
-builder.add_edge("summarize", "examiner")
+if GRAPH_VARIANT == "combined":
+    builder.add_conditional_edges(
+        "summarize",
+        summary_decision,
+        {
+            "correct": END,
+            "examiner": "examiner",
+            "planner": "planner",
+            "budget_exhausted": END,
+        },
+    )
+else:
+    builder.add_edge("summarize", "examiner")
 builder.add_edge("history", "planner")
 builder.add_conditional_edges(
-    "examiner", examiner_decision, {"planner": "planner", "correct": END}
+    "examiner",
+    examiner_decision,
+    {"planner": "planner", "correct": END, "budget_exhausted": END},
 )
 
-graph = builder.compile()
+# Checkpoints after every node let an interrupted session run resume where it stopped
+checkpointer = create_checkpointer()
+graph = builder.compile(checkpointer=checkpointer)
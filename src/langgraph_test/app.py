@@ -1,68 +1,151 @@
 import asyncio
 import json
+import logging
 import os
-from concurrent.futures import ThreadPoolExecutor
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-from agent_builder import graph
-from fastapi import FastAPI, HTTPException
-from nodes.state_agent import AgentState, ConversationEntry
-from pydantic import BaseModel
+from agent_builder import GRAPH_NODES, GRAPH_VARIANT, checkpointer, graph
+from batch import abatch
+from budget import request_budget
+from checkpointing import (
+    is_interrupted,
+    load_checkpoint,
+    resume_input,
+    reused_memory,
+    run_config,
+    session_locks,
+)
+from coalescing import SingleFlight, coalesce_key
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from jobs import JOB_MAX_QUEUED, JobWorkers, QueueFull, create_job_store
+from nodes.state_agent import (
+    AgentMemory,
+    AgentState,
+    BudgetLimits,
+    ConversationEntry,
+    MemoryKind,
+    RunBudget,
+)
+from observability import (
+    COALESCED_REQUESTS,
+    JOBS,
+    LOOP_ITERATIONS,
+    REQUEST_DURATION,
+    configure_logging,
+    log_event,
+    render_metrics,
+    session_id_var,
+    span,
+)
+from profiling import folded_stacks, profile_reason, profile_store, profiled
+from pydantic import BaseModel, Field
+from responses import (
+    GZIP_LEVEL,
+    GZIP_MIN_BYTES,
+    HISTORY_PAGE_SIZE,
+    QUERY_HISTORY_LIMIT,
+    QUERY_RESPONSE_FIELDS,
+    QueryGZipMiddleware,
+    QueryResponse,
+    decode_cursor,
+    encode_cursor,
+    unknown_fields,
+)
+from session_store import create_session_store
+from tools.history_index import history_indexes
+from tools.http_pools import aclose_loop_clients
+from tools.llm_cache import llm_cache
+from tools.llm_clients import is_rate_limited
+from tools.prefetch import speculative_prefetch
+from tools.prompt_budget import prompt_token_usage
+from tools.wiki_cache import wiki_cache
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Configure logging and run the job workers for as long as the server is up"""
+    configure_logging()
+    await job_workers.start()
+    try:
+        yield
+    finally:
+        await job_workers.stop()
+        await aclose_loop_clients()
+
 
 app = FastAPI(
     title="LangGraph Research Agent API",
     description="API for querying information using LangGraph with Wikipedia research",
     version="1.0.0",
+    lifespan=lifespan,
 )
+if GZIP_MIN_BYTES > 0:
+    app.add_middleware(
+        QueryGZipMiddleware, minimum_size=GZIP_MIN_BYTES, compresslevel=GZIP_LEVEL
+    )
 
-# In-memory session storage (you can replace with database later)
+# Session storage: SQLite by default, SESSION_BACKEND=file keeps one JSON per session
 SESSIONS_DIR = Path("sessions")
 SESSIONS_DIR.mkdir(exist_ok=True)
+session_store = create_session_store(SESSIONS_DIR)
+
+# Opt-in: identical concurrent queries (same normalized text, prior turns,
+# reused research and budget) share a run
+COALESCE_QUERIES = os.getenv("COALESCE_QUERIES", "0") == "1"
+inflight_queries = SingleFlight()
 
 
 class QueryRequest(BaseModel):
     query: str
     session_id: Optional[str] = None
+    # Unset limits fall back to the server defaults (QUERY_* variables)
+    budget: Optional[BudgetLimits] = None
+    # Response fields to return, e.g. ["summary"] (QUERY_RESPONSE_FIELDS by default)
+    fields: Optional[List[str]] = None
+    # Latest turns returned in conversation_history; older ones are paged
+    # through /sessions/{id}/history with history_cursor
+    history_limit: Optional[int] = Field(None, ge=0)
 
 
-class QueryResponse(BaseModel):
-    query: str
-    summary: str
-    research_count: int
-    memory: list[str]
-    status: str
-    session_id: str
-    conversation_history: List[ConversationEntry] = []
+class JobRequest(QueryRequest):
+    # Queued jobs run highest priority first, oldest first within a class
+    priority: Literal["high", "normal", "low"] = "normal"
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+    concurrency: Optional[int] = None
 
 
 def load_conversation_history(session_id: str) -> List[ConversationEntry]:
-    """Load conversation history from file"""
-    session_file = SESSIONS_DIR / f"{session_id}.json"
-    if session_file.exists():
-        try:
-            with open(session_file, "r") as f:
-                data = json.load(f)
-                return [ConversationEntry(**entry) for entry in data]
-        except Exception as e:
-            print(f"Error loading session {session_id}: {e}")
+    """Load conversation history from the session store"""
+    try:
+        with span("session", "load"):
+            return session_store.load(session_id)
+    except Exception as e:
+        log_event(logger, "session_load_failed", level=logging.ERROR, error=str(e))
     return []
 
 
-def save_conversation_history(session_id: str, history: List[ConversationEntry]):
-    """Save conversation history to file"""
-    session_file = SESSIONS_DIR / f"{session_id}.json"
+def save_conversation_entry(session_id: str, entry: ConversationEntry):
+    """Append one conversation entry to the session store"""
     try:
-        with open(session_file, "w") as f:
-            json.dump([entry.dict() for entry in history], f, indent=2)
+        with span("session", "save"):
+            session_store.append(session_id, entry)
     except Exception as e:
-        print(f"Error saving session {session_id}: {e}")
+        log_event(logger, "session_save_failed", level=logging.ERROR, error=str(e))
 
 
 def generate_session_id() -> str:
@@ -78,8 +161,120 @@ async def root():
     return {"message": "LangGraph Research Agent API is running"}
 
 
+async def prepare_query(request: QueryRequest, session_id: str):
+    """Load the session and build the graph input for a request.
+
+    Call it holding ``session_locks.hold(session_id)`` until the turn is saved.
+    Returns ``(session_id, conversation_history, initial_state, graph_input)``.
+    When the session's last run of the same query was interrupted,
+    ``graph_input`` resumes it from its checkpoint with this request's budget;
+    otherwise it is ``initial_state``, seeded with the research of the session's last run.
+    """
+    session_id_var.set(session_id)
+    conversation_history = await asyncio.to_thread(
+        load_conversation_history, session_id
+    )
+    with span("checkpoint", "load"):
+        checkpoint = await load_checkpoint(graph, session_id)
+
+    memory = reused_memory(checkpoint)
+    initial_state = AgentState(
+        task=request.query,
+        memory=memory,
+        next_action="",
+        failed_attempts=0,
+        decision="",
+        session_id=session_id,
+        reused_research=memory.count(MemoryKind.RESEARCH),
+        budget=request_budget(request.budget),
+    )
+    if is_interrupted(checkpoint, request.query):
+        log_event(logger, "query_resumed", next=list(checkpoint["next"]))
+        return (
+            session_id,
+            conversation_history,
+            initial_state,
+            resume_input(initial_state.budget),
+        )
+    return session_id, conversation_history, initial_state, initial_state
+
+
+async def complete_query(
+    request: QueryRequest,
+    session_id: str,
+    conversation_history: List[ConversationEntry],
+    final_state: dict,
+) -> QueryResponse:
+    """Extract the answer from the final state, save the session and respond.
+
+    Research reused from the session's previous run is not counted as
+    research of this query.
+    """
+    memory: AgentMemory = final_state["memory"]
+    budget: Optional[RunBudget] = final_state.get("budget")
+    reused_research = final_state.get("reused_research", 0)
+    # One planner step per loop, fast-path decisions included
+    LOOP_ITERATIONS.observe(len(final_state.get("planner_path", ())))
+    summaries = memory.contents(MemoryKind.SUMMARY)
+    # The latest summary is the one the examiner accepted or the best effort
+    summary = summaries[-1] if summaries else ""
+
+    # Add this conversation to history
+    new_entry = ConversationEntry(
+        query=request.query, summary=summary, timestamp=datetime.now().isoformat()
+    )
+    conversation_history.append(new_entry)
+    await asyncio.to_thread(save_conversation_entry, session_id, new_entry)
+    history_indexes.append(session_id, conversation_history)
+    if checkpointer is not None:
+        # Only the final checkpoint is needed to seed the next follow-up
+        with span("checkpoint", "prune"):
+            await asyncio.to_thread(checkpointer.prune, session_id)
+
+    history_limit = (
+        request.history_limit
+        if request.history_limit is not None
+        else QUERY_HISTORY_LIMIT
+    )
+    history, history_cursor = conversation_history, None
+    if history_limit is not None and len(conversation_history) > history_limit:
+        start = len(conversation_history) - history_limit
+        history = conversation_history[start:]
+        history_cursor = encode_cursor(start)
+
+    return QueryResponse(
+        query=request.query,
+        summary=summary,
+        research_count=memory.count(MemoryKind.RESEARCH) - reused_research,
+        memory=memory.as_strings(),
+        status="completed",
+        session_id=session_id,
+        conversation_history=history,
+        budget=budget.usage() if budget else None,
+        history_cursor=history_cursor,
+    )
+
+
+def check_fields(request: QueryRequest) -> None:
+    unknown = unknown_fields(request.fields, QueryResponse.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Unknown response fields: {', '.join(unknown)}"
+        )
+
+
+def response_payload(request: QueryRequest, response: QueryResponse) -> dict:
+    """The response fields the request asked for, ready for JSON encoding"""
+    fields = request.fields or QUERY_RESPONSE_FIELDS
+    return response.model_dump(mode="json", include=set(fields) if fields else None)
+
+
 @app.post("/query", response_model=QueryResponse)
-async def process_query(request: QueryRequest):
+async def process_query(
+    request: QueryRequest,
+    profile: bool = Query(False, description="Profile this request"),
+    x_profile: Optional[str] = Header(None),
+):
     """
     Process a query through the LangGraph research agent workflow.
 
@@ -91,70 +286,316 @@ async def process_query(request: QueryRequest):
     5. Summarizes the findings
     6. Saves conversation history
     7. Returns the final result
+
+    With ``?profile=1``, ``X-Profile: 1`` or when sampled, the run is profiled
+    and the ``X-Profile-Id`` response header names the profile. ``fields`` and
+    ``history_limit`` in the request trim the response.
     """
+    check_fields(request)
+    reason = profile_reason(x_profile, profile)
+    async with profiled(reason, query=request.query) as run_profile:
+        response = await run_query(request)
+        headers = {"X-Profile-Id": run_profile.id} if run_profile else None
+        return JSONResponse(response_payload(request, response), headers=headers)
+
+
+async def run_query(request: QueryRequest) -> QueryResponse:
+    """Run one query end to end and save it to its session"""
+    start = time.perf_counter()
+    session_id = request.session_id or generate_session_id()
     try:
-        # Handle session management
-        session_id = request.session_id or generate_session_id()
-        conversation_history = load_conversation_history(session_id)
-
-        initial_state = AgentState(
-            task=request.query,
-            memory=[],
-            next_action="",
-            failed_attempts=0,
-            decision="",
-            conversation_history=conversation_history,
-            session_id=session_id,
+        async with session_locks.hold(session_id):
+            # With PREFETCH_WIKI=1 the first lookup overlaps the planner's LLM call
+            with speculative_prefetch(request.query):
+                (
+                    _,
+                    conversation_history,
+                    initial_state,
+                    graph_input,
+                ) = await prepare_query(request, session_id)
+                config = run_config(session_id, conversation_history)
+                # Resumed runs continue their own thread and are never shared
+                if COALESCE_QUERIES and graph_input is initial_state:
+                    final_state, shared = await inflight_queries.run(
+                        coalesce_key(initial_state, conversation_history),
+                        lambda: graph.ainvoke(graph_input, config),
+                    )
+                    if shared:
+                        COALESCED_REQUESTS.inc()
+                        log_event(logger, "query_coalesced")
+                else:
+                    final_state = await graph.ainvoke(graph_input, config)
+            response = await complete_query(
+                request, session_id, conversation_history, final_state
+            )
+        REQUEST_DURATION.observe(time.perf_counter() - start, endpoint="query")
+        log_event(
+            logger,
+            "query_completed",
+            duration=round(time.perf_counter() - start, 3),
+            research_count=response.research_count,
         )
+        return response
 
-        with ThreadPoolExecutor() as executor:
-            future = executor.submit(graph.invoke, initial_state)
-            final_state = await asyncio.get_event_loop().run_in_executor(
-                None, future.result
+    except Exception as e:
+        log_event(logger, "query_failed", level=logging.ERROR, error=str(e))
+        if is_rate_limited(e):
+            # Retries were exhausted; tell the client to back off, not that we broke
+            raise HTTPException(
+                status_code=503,
+                detail="LLM rate limit reached, retry later",
+                headers={"Retry-After": "30"},
             )
+        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-        summary = ""
-        for entry in final_state["memory"]:
-            if entry.startswith("Final Summary:"):
-                summary = entry.replace("Final Summary: ", "")
-                break
-
-        research_entries = [
-            entry
-            for entry in final_state["memory"]
-            if entry.startswith("Researcher found:")
-        ]
-
-        # Add this conversation to history
-        new_entry = ConversationEntry(
-            query=request.query, summary=summary, timestamp=datetime.now().isoformat()
+
+def node_event(node: str, state: AgentState) -> dict:
+    """Describe a finished node for the event stream"""
+    event = {"node": node, "current_state": state.current_state}
+    if node == "planner":
+        event.update(
+            next_action=state.next_action,
+            decision=state.decision,
+            path=state.planner_path[-1] if state.planner_path else None,
         )
-        conversation_history.append(new_entry)
-        save_conversation_history(session_id, conversation_history)
-
-        return QueryResponse(
-            query=request.query,
-            summary=summary,
-            research_count=len(research_entries),
-            memory=final_state["memory"],
-            status="completed",
-            session_id=session_id,
-            conversation_history=conversation_history,
+    elif node == "research":
+        event.update(
+            hit=state.failed_attempts == 0, failed_attempts=state.failed_attempts
         )
+    elif node == "examiner" or (node == "summarize" and GRAPH_VARIANT == "combined"):
+        event.update(verdict=state.decision)
+    return event
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
+
+@app.post("/query/stream")
+async def stream_query(request: QueryRequest):
+    """
+    Same workflow as /query, streamed as Server-Sent Events.
+
+    Emits a ``node`` event as each graph node finishes, ``token`` events while
+    the summarizer writes its answer, then a ``final`` event carrying the
+    QueryResponse once the session has been saved.
+    """
+    check_fields(request)
+    session_id = request.session_id or generate_session_id()
+
+    async def event_stream():
+        session_id_var.set(session_id)
+        start = time.perf_counter()
+        yield sse_event("session", {"session_id": session_id})
+        try:
+            async with session_locks.hold(session_id):
+                async for event in stream_run(request, session_id):
+                    yield event
+            REQUEST_DURATION.observe(time.perf_counter() - start, endpoint="stream")
+        except Exception as e:
+            log_event(logger, "query_failed", level=logging.ERROR, error=str(e))
+            yield sse_event("error", {"detail": f"Error processing query: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def stream_run(request: QueryRequest, session_id: str):
+    """SSE events of one streamed run, ending with the ``final`` event"""
+    _, conversation_history, initial_state, graph_input = await prepare_query(
+        request, session_id
+    )
+    final_state = dict(initial_state)
+    async for event in graph.astream_events(
+        graph_input, run_config(session_id, conversation_history), version="v2"
+    ):
+        node = event.get("metadata", {}).get("langgraph_node")
+        # The combined variant's summarizer streams JSON, not answer text
+        if (
+            event["event"] == "on_chat_model_stream"
+            and node == "summarize"
+            and GRAPH_VARIANT == "classic"
+        ):
+            token = event["data"]["chunk"].content
+            if token:
+                yield sse_event("token", {"token": token})
+        elif (
+            event["event"] == "on_chain_end"
+            and event["name"] in GRAPH_NODES
+            and isinstance(event["data"].get("output"), AgentState)
+        ):
+            state = event["data"]["output"]
+            final_state = dict(state)
+            yield sse_event("node", node_event(event["name"], state))
+        elif event["event"] == "on_chain_end" and not event.get("parent_ids"):
+            # Top-level graph end carries the authoritative final state
+            output = event["data"]["output"]
+            if not isinstance(output, dict):
+                output = dict(output)
+            final_state = {**final_state, **output}
+
+    response = await complete_query(
+        request, session_id, conversation_history, final_state
+    )
+    yield sse_event("final", response_payload(request, response))
+
+
+@app.post("/query/batch")
+async def batch_query(request: BatchQueryRequest):
+    """
+    Run many queries with bounded concurrency, streamed back as NDJSON.
+
+    Each line is ``{"index", "status", "response" | "detail"}`` and is sent as
+    soon as that query finishes, so lines arrive out of input order. Identical
+    Wikipedia lookups across the batch are fetched once.
+    """
+    for item in request.queries:
+        check_fields(item)
+    session_ids = [
+        item.session_id or generate_session_id() for item in request.queries
+    ]
+    if len(set(session_ids)) < len(session_ids):
+        # Turns of one session run in order, so they cannot share a batch
+        raise HTTPException(
+            status_code=422, detail="Each batch query needs its own session_id"
+        )
+
+    async def result_stream():
+        async with AsyncExitStack() as locks:
+            # Sorted, so overlapping batches cannot deadlock on each other
+            for session_id in sorted(session_ids):
+                await locks.enter_async_context(session_locks.hold(session_id))
+            async for line in batch_lines(request, session_ids):
+                yield line
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+
+async def batch_lines(request: BatchQueryRequest, session_ids: list[str]):
+    """NDJSON lines of a batch whose sessions are all held"""
+    prepared = [
+        await prepare_query(item, session_id)
+        for item, session_id in zip(request.queries, session_ids)
+    ]
+    states = [graph_input for _, _, _, graph_input in prepared]
+    configs = [
+        run_config(session_id, conversation_history)
+        for session_id, conversation_history, _, _ in prepared
+    ]
+    async for index, result in abatch(states, request.concurrency, configs):
+        item = request.queries[index]
+        session_id, conversation_history, _, _ = prepared[index]
+        if isinstance(result, Exception):
+            log_event(logger, "query_failed", level=logging.ERROR, error=str(result))
+            line = {"index": index, "status": "error", "detail": str(result)}
+        else:
+            response = await complete_query(
+                item, session_id, conversation_history, result
+            )
+            line = {
+                "index": index,
+                "status": "completed",
+                "response": response_payload(item, response),
+            }
+        yield json.dumps(line) + "\n"
+
+
+async def run_job(request: dict) -> dict:
+    """Job worker entry point: run a stored QueryRequest, return its payload"""
+    query_request = QueryRequest(**request)
+    return response_payload(query_request, await run_query(query_request))
+
+
+# Durable job queue; JOB_WORKERS workers in this process drain it
+job_store = create_job_store()
+job_workers = JobWorkers(job_store, run_job)
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Queue a query and return at once with a job id.
+
+    Poll ``GET /jobs/{job_id}`` for the result. The session id is fixed now,
+    so follow-ups can be queued before the job finishes; jobs of one session
+    run one at a time, in submission order. Answers 429 when
+    ``JOB_MAX_QUEUED`` jobs are already waiting.
+    """
+    check_fields(request)
+    # Unset fields stay unset, so the worker applies the server defaults
+    query = request.dict(exclude={"priority"}, exclude_unset=True)
+    query["session_id"] = request.session_id or generate_session_id()
+    try:
+        job_id = await asyncio.to_thread(
+            job_store.enqueue, query, request.priority, JOB_MAX_QUEUED
+        )
+    except QueueFull as e:
+        JOBS.inc(status="rejected")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Job queue is full ({e}), retry later",
+            headers={"Retry-After": "10"},
+        )
+    JOBS.inc(status="queued")
+    job_workers.notify()
+    log_event(logger, "job_queued", job_id=job_id, priority=request.priority)
+    return JSONResponse(
+        {
+            "job_id": job_id,
+            "status": "queued",
+            "priority": request.priority,
+            "session_id": query["session_id"],
+        },
+        status_code=202,
+        headers={"Location": f"/jobs/{job_id}"},
+    )
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status, queue position while queued, and the result once completed"""
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a job: queued jobs at once, running ones at their next check"""
+    status = await asyncio.to_thread(job_store.cancel, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, "status": status, "cancel_requested": status == "running"}
 
 
 @app.get("/sessions/{session_id}/history")
-async def get_conversation_history(session_id: str):
-    """Get conversation history for a specific session"""
+async def get_conversation_history(
+    session_id: str,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=1000),
+    cursor: Optional[str] = None,
+):
+    """Get conversation history for a specific session, newest page first.
+
+    Each page is in chronological order; pass ``next_cursor`` back as
+    ``cursor`` to fetch the turns before it.
+    """
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
-        history = load_conversation_history(session_id)
+        history, start, total = await asyncio.to_thread(
+            session_store.load_page, session_id, limit, before
+        )
         return {
             "session_id": session_id,
-            "conversation_count": len(history),
+            "conversation_count": total,
             "history": history,
+            "next_cursor": encode_cursor(start) if start > 0 else None,
         }
     except Exception as e:
         raise HTTPException(
@@ -166,36 +607,59 @@ async def get_conversation_history(session_id: str):
 async def clear_session(session_id: str):
     """Clear conversation history for a specific session"""
     try:
-        session_file = SESSIONS_DIR / f"{session_id}.json"
-        if session_file.exists():
-            session_file.unlink()
+        await asyncio.to_thread(session_store.delete, session_id)
+        history_indexes.drop(session_id)
+        if checkpointer is not None:
+            await checkpointer.adelete_thread(session_id)
         return {"message": f"Session {session_id} cleared successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing session: {str(e)}")
 
 
 @app.get("/sessions")
-async def list_sessions():
-    """List all active sessions"""
+async def list_sessions(
+    limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)
+):
+    """List active sessions, paginated with limit/offset"""
     try:
-        sessions = []
-        for session_file in SESSIONS_DIR.glob("*.json"):
-            session_id = session_file.stem
-            history = load_conversation_history(session_id)
-            if history:
-                sessions.append(
-                    {
-                        "session_id": session_id,
-                        "conversation_count": len(history),
-                        "last_query": history[-1].query if history else None,
-                        "last_timestamp": history[-1].timestamp if history else None,
-                    }
-                )
-        return {"sessions": sessions}
+        sessions = await asyncio.to_thread(session_store.list_sessions, limit, offset)
+        total = await asyncio.to_thread(session_store.count_sessions)
+        return {
+            "sessions": sessions,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing sessions: {str(e)}")
 
 
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Span timeline and stack samples of a profiled request"""
+    profile = await asyncio.to_thread(profile_store.load, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@app.get("/profiles/{profile_id}/flamegraph", response_class=PlainTextResponse)
+async def get_profile_flamegraph(profile_id: str, idle: bool = True):
+    """Folded stacks for flamegraph.pl or speedscope; ``idle=false`` keeps busy samples"""
+    profile = await asyncio.to_thread(profile_store.load, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded_stacks(profile, idle))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for nodes, LLM calls, Wikipedia and routing"""
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/health")
 async def health_check():
     """Detailed health check with component status"""
@@ -206,7 +670,6 @@ async def health_check():
             next_action="",
             failed_attempts=0,
             decision="",
-            conversation_history=[],
             session_id="test",
         )
 
@@ -221,6 +684,10 @@ async def health_check():
                 "wikipedia": "available",
                 "sessions": "enabled",
             },
+            "wiki_cache": wiki_cache.stats(),
+            "llm_cache": llm_cache.stats(),
+            "prompt_tokens": prompt_token_usage,
+            "jobs": job_store.stats(),
         }
     except Exception as e:
         return {"status": "unhealthy", "error": str(e)}
@@ -0,0 +1,69 @@
+import asyncio
+import os
+from typing import AsyncIterator, Optional
+
+from agent_builder import graph
+from checkpointing import run_config
+from langgraph.types import Command
+from nodes.state_agent import AgentState
+from observability import session_id_var
+from tools.http_pools import aclose_loop_clients
+from tools.wiki_tool import shared_lookups
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 64))
+
+
+async def abatch(
+    states: list[AgentState | Command],
+    concurrency: Optional[int] = None,
+    configs: Optional[list[dict]] = None,
+) -> AsyncIterator[tuple[int, dict | Exception]]:
+    """Run ``states`` through the graph concurrently.
+
+    Yields ``(index, final_state)`` as each run finishes (an exception takes
+    the place of the final state when a run fails). At most ``concurrency``
+    runs are in flight, and identical Wikipedia lookups across the batch are
+    fetched once and shared. ``configs`` defaults to each state's session
+    thread; a ``Command`` from ``checkpointing.resume_input`` resumes that
+    thread's interrupted run.
+    """
+    limit = max(1, min(concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(limit)
+    configs = configs or [run_config(state.session_id) for state in states]
+
+    async def run(index: int, state: AgentState | Command, config: dict):
+        async with semaphore:
+            session_id_var.set(config["configurable"]["thread_id"])
+            try:
+                return index, await graph.ainvoke(state, config)
+            except Exception as e:
+                return index, e
+
+    with shared_lookups():
+        tasks = [
+            asyncio.create_task(run(i, state, config))
+            for i, (state, config) in enumerate(zip(states, configs))
+        ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def batch(states: list[AgentState], concurrency: Optional[int] = None) -> list:
+    """Blocking wrapper around ``abatch``; results are returned in input order"""
+
+    async def collect():
+        results = [None] * len(states)
+        try:
+            async for index, result in abatch(states, concurrency):
+                results[index] = result
+        finally:
+            # This loop ends with asyncio.run; its connections cannot outlive it
+            await aclose_loop_clients()
+        return results
+
+    return asyncio.run(collect())
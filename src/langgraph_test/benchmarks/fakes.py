@@ -0,0 +1,82 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Callable
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from tools.llm_clients import llm_registry
+from tools.wiki_cache import normalize_query
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model whose reply is computed from the prompt, after a fixed delay.
+
+    ``responder`` must be a pure function of the prompt so one instance can
+    serve concurrent runs deterministically.
+    """
+
+    responder: Callable[[str], str]
+    latency: float = 0.0
+    model_name: str = "scripted"
+    temperature: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat-model"
+
+    def _result(self, messages) -> ChatResult:
+        self.calls += 1
+        prompt = "\n".join(str(message.content) for message in messages)
+        message = AIMessage(content=self.responder(prompt))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+
+class LocalWiki:
+    """Fixture-backed stand-in for the Wikipedia backend used by wiki_search"""
+
+    def __init__(self, articles: dict[str, str], latency: float = 0.0):
+        self.articles = {normalize_query(k): v for k, v in articles.items()}
+        self.latency = latency
+        self.calls = 0
+
+    @classmethod
+    def from_fixture(cls, path: Path = FIXTURES_DIR / "wiki.json", latency=0.0):
+        with open(path) as f:
+            return cls(json.load(f), latency=latency)
+
+    def _lookup(self, query: str) -> str:
+        self.calls += 1
+        return self.articles.get(
+            normalize_query(query), "No good Wikipedia Search Result was found"
+        )
+
+    def invoke(self, query: str) -> str:
+        time.sleep(self.latency)
+        return self._lookup(query)
+
+    async def ainvoke(self, query: str) -> str:
+        await asyncio.sleep(self.latency)
+        return self._lookup(query)
+
+
+def install_fakes(models: dict[str, ScriptedChatModel], wiki: LocalWiki) -> None:
+    """Swap the node LLMs and the Wikipedia backend for offline stand-ins"""
+    import tools.wiki_tool
+
+    for node, model in models.items():
+        llm_registry.set(node, model)
+    tools.wiki_tool.wiki = wiki
@@ -0,0 +1,79 @@
+"""
+HTTP load driver for the running API (real or ``benchmarks.serve``).
+
+    python -m benchmarks.load --url http://127.0.0.1:8001 --requests 200 --concurrency 20
+"""
+
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.report import summarize_latencies, write_results
+
+DEFAULT_QUERIES = [
+    "What is photosynthesis?",
+    "What is the capital of France and what language is spoken in Jordan?",
+    "Who is Leo Messi?",
+]
+
+
+def send_query(url: str, query: str, timeout: float) -> tuple[float, int]:
+    body = json.dumps({"query": query}).encode()
+    request = urllib.request.Request(
+        f"{url}/query", data=body, headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return time.perf_counter() - start, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument(
+        "--query", action="append", help="query to send (repeatable)", default=None
+    )
+    parser.add_argument("--output-dir", default=None)
+    args = parser.parse_args()
+
+    url = args.url.rstrip("/")
+    queries = args.query or DEFAULT_QUERIES
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        outcomes = list(
+            executor.map(
+                lambda i: send_query(url, queries[i % len(queries)], args.timeout),
+                range(args.requests),
+            )
+        )
+    wall = time.perf_counter() - wall_start
+
+    ok = [latency for latency, status in outcomes if status == 200]
+    results = {
+        **summarize_latencies(ok),
+        "requests": args.requests,
+        "errors": args.requests - len(ok),
+        "throughput_rps": round(len(ok) / wall, 2),
+        "wall_seconds": round(wall, 2),
+    }
+    print(json.dumps(results, indent=2))
+
+    config = {k: v for k, v in vars(args).items() if k != "output_dir"}
+    path = write_results("http", config, results, args.output_dir)
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import json
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 < pct <= 100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize_latencies(latencies: list[float]) -> dict:
+    """Latency summary in milliseconds"""
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 2) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2) if ms else 0.0,
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def write_results(kind: str, config: dict, results: dict, output_dir=None) -> Path:
+    """Save a benchmark run as JSON so later runs can be compared against it"""
+    output_dir = Path(output_dir or RESULTS_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    started = datetime.now()
+    path = output_dir / f"{kind}-{started.strftime('%Y%m%d-%H%M%S')}.json"
+    payload = {
+        "kind": kind,
+        "timestamp": started.isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
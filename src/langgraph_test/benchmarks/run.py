@@ -0,0 +1,148 @@
+"""
+Offline graph benchmark: runs the scenarios in ``scenarios.py`` through
+``agent_builder.graph`` with scripted LLMs and a fixture-backed Wikipedia.
+
+Run from ``src/langgraph_test``:
+
+    python -m benchmarks.run --iterations 20 --llm-latency 0.05 --wiki-latency 0.1
+
+``--wiki stub`` serves the fixture over HTTP from ``benchmarks.wiki_stub`` and
+searches it with the real ``WikipediaClient`` instead of the in-process fake.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+# Keep benchmark runs away from the real caches and credentials
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+os.environ.setdefault("WIKI_CACHE_PATH", "")
+os.environ.setdefault("LLM_CACHE_PATH", "")
+os.environ.setdefault("CHECKPOINT_DB_PATH", "")
+
+from agent_builder import graph  # noqa: E402
+from checkpointing import run_config  # noqa: E402
+from nodes.state_agent import AgentMemory, AgentState  # noqa: E402
+from tools.http_pools import aclose_loop_clients  # noqa: E402
+from tools.llm_cache import llm_cache  # noqa: E402
+from tools.wiki_client import WikipediaClient  # noqa: E402
+from tools.wiki_cache import wiki_cache  # noqa: E402
+
+from benchmarks.fakes import LocalWiki, ScriptedChatModel, install_fakes  # noqa: E402
+from benchmarks.report import summarize_latencies, write_results  # noqa: E402
+from benchmarks.scenarios import SCENARIOS, Scenario  # noqa: E402
+from benchmarks.wiki_stub import WikiStub, WikiStubServer  # noqa: E402
+
+
+def initial_state(scenario: Scenario) -> AgentState:
+    return AgentState(
+        task=scenario.task,
+        memory=AgentMemory(),
+        next_action="",
+        failed_attempts=0,
+        decision="",
+        session_id=f"bench-{scenario.name}",
+    )
+
+
+def scenario_config(scenario: Scenario) -> dict:
+    return run_config(f"bench-{scenario.name}", scenario.conversation_history)
+
+
+def install_scenario(scenario: Scenario, args) -> tuple[dict, object]:
+    """Install the scenario's fakes; returns the models and the Wikipedia
+    stand-in, whose ``calls`` counts lookups"""
+    models = {
+        node: ScriptedChatModel(responder=responder, latency=args.llm_latency)
+        for node, responder in scenario.responders().items()
+    }
+    if args.wiki == "stub":
+        wiki = WikiStubServer(WikiStub.from_fixture(), latency=args.wiki_latency)
+        install_fakes(models, WikipediaClient(api_url=wiki.start().url))
+    else:
+        wiki = LocalWiki.from_fixture(latency=args.wiki_latency)
+        install_fakes(models, wiki)
+    return models, wiki
+
+
+async def run_scenario(scenario: Scenario, args) -> dict:
+    models, wiki = install_scenario(scenario, args)
+    try:
+        return await measure_scenario(scenario, args, models, wiki)
+    finally:
+        await aclose_loop_clients()
+        if isinstance(wiki, WikiStubServer):
+            wiki.stop()
+
+
+async def measure_scenario(scenario: Scenario, args, models: dict, wiki) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def run_once():
+        async with semaphore:
+            if not args.warm_cache:
+                wiki_cache.clear()
+                llm_cache.clear()
+            start = time.perf_counter()
+            if args.mode == "async":
+                await graph.ainvoke(initial_state(scenario), scenario_config(scenario))
+            else:
+                await asyncio.to_thread(
+                    graph.invoke, initial_state(scenario), scenario_config(scenario)
+                )
+            latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(run_once() for _ in range(args.iterations)))
+    wall = time.perf_counter() - wall_start
+
+    return {
+        **summarize_latencies(latencies),
+        "throughput_rps": round(args.iterations / wall, 2),
+        "llm_calls_per_run": {
+            node: model.calls / args.iterations for node, model in models.items()
+        },
+        "wiki_calls_per_run": wiki.calls / args.iterations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenario", action="append", choices=sorted(SCENARIOS), default=None
+    )
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--mode", choices=("async", "sync"), default="async")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--wiki-latency", type=float, default=0.1)
+    parser.add_argument(
+        "--wiki",
+        choices=("fixture", "stub"),
+        default="fixture",
+        help="in-process fixture, or the real client against a local stub server",
+    )
+    parser.add_argument(
+        "--warm-cache", action="store_true", help="keep caches between runs"
+    )
+    parser.add_argument("--output-dir", default=None)
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenario or sorted(SCENARIOS):
+        results[name] = asyncio.run(run_scenario(SCENARIOS[name], args))
+        print(
+            f"{name:18} p50 {results[name]['p50_ms']:8.1f} ms  "
+            f"p95 {results[name]['p95_ms']:8.1f} ms  "
+            f"{results[name]['throughput_rps']:7.2f} runs/s"
+        )
+
+    config = {k: v for k, v in vars(args).items() if k != "output_dir"}
+    path = write_results("graph", config, results, args.output_dir)
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import re
+from dataclasses import dataclass, field
+
+from nodes.state_agent import ConversationEntry
+
+
+def research_count(prompt: str) -> int:
+    match = re.search(r"Research status: (\d+) pieces", prompt)
+    return int(match.group(1)) if match else 0
+
+
+def planner_script(terms: list[str]):
+    """Planner that researches ``terms`` one per loop, then stops"""
+
+    def respond(prompt: str) -> str:
+        count = research_count(prompt)
+        return f"[{terms[count]}]" if count < len(terms) else "STOP"
+
+    return respond
+
+
+def history_planner(prompt: str) -> str:
+    if "last thing was checked: history was checked" in prompt:
+        return "STOP"
+    return "check_history"
+
+
+def examiner_script(rejections: int):
+    """Examiner that rejects the first ``rejections`` summaries"""
+
+    def respond(prompt: str) -> str:
+        summaries = prompt.count("Final Summary:")
+        return "planner" if summaries <= rejections else "correct"
+
+    return respond
+
+
+def summarizer(prompt: str) -> str:
+    return "Scripted answer built from the research data above."
+
+
+def history_answer(prompt: str) -> str:
+    return "The answer was already given earlier in this conversation."
+
+
+@dataclass
+class Scenario:
+    name: str
+    task: str
+    planner: object
+    examiner: object = field(default_factory=lambda: examiner_script(0))
+    conversation_history: list[ConversationEntry] = field(default_factory=list)
+
+    def responders(self) -> dict:
+        return {
+            "planner": self.planner,
+            "summarizer": summarizer,
+            "examiner": self.examiner,
+            "history": history_answer,
+        }
+
+
+SCENARIOS = {
+    "single_hop": Scenario(
+        name="single_hop",
+        task="What is photosynthesis?",
+        planner=planner_script(["photosynthesis"]),
+    ),
+    "multi_hop": Scenario(
+        name="multi_hop",
+        task="What is the capital of France and what language is spoken in Jordan?",
+        planner=planner_script(["capital France", "language Jordan"]),
+    ),
+    "history_answered": Scenario(
+        name="history_answered",
+        task="What is photosynthesis?",
+        planner=history_planner,
+        conversation_history=[
+            ConversationEntry(
+                query="What is photosynthesis?",
+                summary="Photosynthesis converts light energy into chemical energy.",
+                timestamp="2025-01-01T00:00:00",
+            )
+        ],
+    ),
+    "examiner_retry": Scenario(
+        name="examiner_retry",
+        task="Who is Leo Messi?",
+        planner=planner_script(["Leo Messi", "Leo Messi"]),
+        examiner=examiner_script(1),
+    ),
+}
@@ -0,0 +1,47 @@
+"""
+Start the FastAPI app with scripted LLMs and the fixture Wikipedia so the
+HTTP load driver can run without OpenAI or network access.
+
+Run from ``src/langgraph_test``:
+
+    python -m benchmarks.serve --scenario single_hop --port 8001
+"""
+
+import argparse
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+os.environ.setdefault("WIKI_CACHE_PATH", "")
+os.environ.setdefault("LLM_CACHE_PATH", "")
+
+import uvicorn  # noqa: E402
+
+from benchmarks.fakes import LocalWiki, ScriptedChatModel, install_fakes  # noqa: E402
+from benchmarks.scenarios import SCENARIOS  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="single_hop")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--wiki-latency", type=float, default=0.1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args()
+
+    scenario = SCENARIOS[args.scenario]
+    install_fakes(
+        {
+            node: ScriptedChatModel(responder=responder, latency=args.llm_latency)
+            for node, responder in scenario.responders().items()
+        },
+        LocalWiki.from_fixture(latency=args.wiki_latency),
+    )
+
+    from app import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Local stand-in for the MediaWiki query API, serving the Wikipedia fixture.
+
+Answers the two request shapes ``tools.wiki_client.WikipediaClient`` sends
+(``generator=search`` and ``titles=A|B``), so the real client, its connection
+pool and its batching can be exercised offline. Run from ``src/langgraph_test``:
+
+    python -m benchmarks.wiki_stub --port 8002
+    WIKI_API_URL=http://127.0.0.1:8002/w/api.php uvicorn app:app --port 8000
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from tools.passages import split_pages
+from tools.wiki_cache import normalize_query
+
+from benchmarks.fakes import FIXTURES_DIR
+
+
+class WikiStub:
+    """Search results and pages parsed from ``Page:/Summary:`` fixture text"""
+
+    def __init__(self, articles: dict[str, str]):
+        self.results: dict[str, list[str]] = {}
+        self.pages: dict[str, str] = {}
+        for query, text in articles.items():
+            titles = []
+            for title, summary in split_pages(text):
+                self.pages[title] = summary
+                titles.append(title)
+            self.results[normalize_query(query)] = titles
+
+    @classmethod
+    def from_fixture(cls, path: Path = FIXTURES_DIR / "wiki.json") -> "WikiStub":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def _page(self, title: str, chars: int, index=None) -> dict:
+        if title not in self.pages:
+            return {"title": title, "missing": True}
+        page = {"pageid": abs(hash(title)) % 10**8, "ns": 0, "title": title}
+        if index is not None:
+            page["index"] = index
+        page["extract"] = self.pages[title][:chars]
+        return page
+
+    def query(self, params: dict[str, str]) -> dict:
+        chars = int(params.get("exchars", 1200))
+        if params.get("generator") == "search":
+            limit = int(params.get("gsrlimit", 10))
+            titles = self.results.get(normalize_query(params.get("gsrsearch", "")), [])
+            pages = [
+                self._page(title, chars, index)
+                for index, title in enumerate(titles[:limit], 1)
+            ]
+        else:
+            titles = [t for t in params.get("titles", "").split("|") if t]
+            pages = [self._page(title, chars) for title in titles]
+        if not pages:
+            return {"batchcomplete": True}
+        return {"batchcomplete": True, "query": {"pages": pages}}
+
+
+class WikiStubServer:
+    """Threaded HTTP server for a ``WikiStub``; ``url`` is its api.php endpoint"""
+
+    def __init__(self, stub: WikiStub, host="127.0.0.1", port=0, latency=0.0):
+        self.stub = stub
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, as the client pools
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                with server._lock:
+                    server.calls += 1
+                time.sleep(server.latency)
+                body = json.dumps(server.stub.query(params)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/w/api.php"
+
+    def start(self) -> "WikiStubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = WikiStubServer(
+        WikiStub.from_fixture(), args.host, args.port, args.latency
+    )
+    print(f"Serving the Wikipedia fixture at {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Per-request run budgets (deadline, LLM calls, tokens, examiner retries).
+
+Every graph node is wrapped by ``enforce_budget``. Before a node runs, the
+wrapper checks the run's budget; once a limit is hit the graph heads straight
+to a best-effort summary and ends. LLM usage is charged to the budget of the
+node currently running through ``tools.llm_clients.budget_var``.
+"""
+
+import functools
+import inspect
+import logging
+import os
+from typing import Optional
+
+from nodes.state_agent import (
+    AgentState,
+    BudgetLimits,
+    MemoryKind,
+    ResourceLimits,
+    RunBudget,
+)
+from observability import BUDGET_EXHAUSTED, log_event
+from tools.llm_clients import budget_var
+
+logger = logging.getLogger(__name__)
+
+
+def _env_number(name: str, default, cast=int):
+    value = os.getenv(name, str(default))
+    return cast(value) if value else None
+
+
+# Server defaults (empty = unlimited); requests may lower them, never raise them
+DEFAULT_LIMITS = ResourceLimits(
+    deadline_seconds=_env_number("QUERY_DEADLINE_SECONDS", 120, float),
+    max_llm_calls=_env_number("QUERY_MAX_LLM_CALLS", 20),
+    max_tokens=_env_number("QUERY_MAX_TOKENS", 60_000),
+    max_examiner_retries=_env_number("QUERY_MAX_EXAMINER_RETRIES", 2),
+)
+
+
+def request_budget(limits: Optional[BudgetLimits] = None) -> RunBudget:
+    """Server defaults, tightened by the limits a request set explicitly.
+
+    A request limit above the server default is clamped to it, so one request
+    cannot hold a worker longer than the server allows.
+    """
+    budget = DEFAULT_LIMITS.dict()
+    overrides = limits.dict(exclude_unset=True) if limits else {}
+    for name, value in overrides.items():
+        default = budget[name]
+        budget[name] = value if default is None else min(value, default)
+    return RunBudget(**budget)
+
+
+def _skip_node(name: str, state: AgentState) -> bool:
+    """Route around ``name`` when the budget is spent; True if it must not run"""
+    reason = state.budget.check()
+    if reason is None:
+        return False
+    if state.budget.exhausted is None:
+        state.budget.exhausted = reason
+        BUDGET_EXHAUSTED.inc(reason=reason)
+        log_event(logger, "budget_exhausted", reason=reason, node=name)
+
+    if name == "summarize":
+        # The best-effort summary is the one call still allowed
+        return state.memory.count(MemoryKind.SUMMARY) > 0
+    if name == "planner":
+        state.decision = "summarize"
+        state.research_terms = []
+        state.planner_path.append("budget")
+    elif name == "examiner":
+        state.decision = "budget_exhausted"
+    state.current_state = f"budget exhausted ({state.budget.exhausted})"
+    return True
+
+
+def enforce_budget(name: str, func):
+    """Wrap a sync or async node with the budget check and LLM charging"""
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(state):
+            if _skip_node(name, state):
+                return state
+            token = budget_var.set(state.budget)
+            try:
+                return await func(state)
+            finally:
+                budget_var.reset(token)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(state):
+        if _skip_node(name, state):
+            return state
+        token = budget_var.set(state.budget)
+        try:
+            return func(state)
+        finally:
+            budget_var.reset(token)
+
+    return wrapper
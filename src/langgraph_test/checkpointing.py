@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+import sqlite3
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional, Sequence
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.types import Command
+from nodes.state_agent import AgentMemory, ConversationEntry, MemoryKind, RunBudget
+from observability import log_event
+from tools.wiki_cache import is_negative_result
+
+logger = logging.getLogger(__name__)
+
+# Graph checkpoints, one LangGraph thread per session (empty disables them)
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "sessions/checkpoints.sqlite3")
+# Research entries from the session's previous run carried into a follow-up
+REUSE_RESEARCH_ENTRIES = int(os.getenv("REUSE_RESEARCH_ENTRIES", 6))
+
+
+class ThreadedSqliteSaver(SqliteSaver):
+    """SqliteSaver whose async methods run the sync ones in a worker thread.
+
+    The connection is shared across threads behind SqliteSaver's own lock, so
+    one saver serves both ``graph.invoke`` and ``graph.ainvoke``.
+    """
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def prune(self, thread_id: str) -> None:
+        """Drop every checkpoint of ``thread_id`` except the latest one"""
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? "
+                "AND checkpoint_ns = '' ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id,),
+            )
+            row = cur.fetchone()
+            if row is None:
+                return
+            for table in ("checkpoints", "writes"):
+                cur.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id != ?",
+                    (thread_id, row[0]),
+                )
+
+
+def create_checkpointer(path: Optional[str] = None) -> Optional[ThreadedSqliteSaver]:
+    path = CHECKPOINT_DB_PATH if path is None else path
+    if not path:
+        return None
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    saver = ThreadedSqliteSaver(conn)
+    saver.setup()
+    return saver
+
+
+class SessionLocks:
+    """One lock per session, so runs on a session's thread never overlap.
+
+    A follow-up (or a client retry) waits for the session's current run to
+    save its turn and checkpoint before it loads them. Locks are per process.
+    """
+
+    def __init__(self):
+        # session_id -> [lock, holders and waiters]
+        self._locks: dict[str, list] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        entry = self._locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            if entry[0].locked():
+                log_event(logger, "session_busy", waiting=entry[1] - 1)
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[session_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+session_locks = SessionLocks()
+
+
+def run_config(
+    session_id: Optional[str],
+    conversation_history: Sequence[ConversationEntry] = (),
+) -> dict:
+    """Graph config that ties a run's checkpoints to its session.
+
+    The session's turns travel in the config rather than the graph state, so
+    checkpoints stay the same size however long the session gets.
+    """
+    return {
+        "configurable": {
+            "thread_id": session_id or "default",
+            "conversation_history": list(conversation_history),
+        }
+    }
+
+
+async def load_checkpoint(graph, session_id: str) -> Optional[dict]:
+    """Latest checkpointed state of the session as ``{"values", "next"}``"""
+    if graph.checkpointer is None:
+        return None
+    try:
+        snapshot = await graph.aget_state(run_config(session_id))
+    except Exception as e:
+        log_event(logger, "checkpoint_load_failed", level=logging.ERROR, error=str(e))
+        return None
+    if not snapshot.values:
+        return None
+    return {"values": snapshot.values, "next": snapshot.next}
+
+
+def is_interrupted(checkpoint: Optional[dict], query: str) -> bool:
+    """True when the session's last run of ``query`` stopped before the end"""
+    return bool(
+        checkpoint
+        and checkpoint["next"]
+        and checkpoint["values"].get("task") == query
+    )
+
+
+def resume_input(budget: RunBudget) -> Command:
+    """Graph input that resumes a thread's interrupted run under ``budget``.
+
+    The checkpointed budget belongs to the interrupted request: its deadline
+    has usually passed and its limits are not the resuming request's.
+    """
+    return Command(update={"budget": budget})
+
+
+def reused_memory(checkpoint: Optional[dict]) -> AgentMemory:
+    """Fresh run memory seeded with the previous run's research"""
+    memory = AgentMemory()
+    if not checkpoint or REUSE_RESEARCH_ENTRIES <= 0:
+        return memory
+    previous = checkpoint["values"].get("memory")
+    if not isinstance(previous, AgentMemory):
+        return memory
+    research = [
+        content
+        for content in dict.fromkeys(previous.contents(MemoryKind.RESEARCH))
+        if not is_negative_result(content)
+    ]
+    for content in research[-REUSE_RESEARCH_ENTRIES:]:
+        memory.add(MemoryKind.RESEARCH, content)
+    return memory
@@ -0,0 +1,59 @@
+import asyncio
+import hashlib
+import json
+from typing import Awaitable, Callable
+
+from nodes.state_agent import AgentState, ConversationEntry, ResourceLimits
+from tools.wiki_cache import normalize_query
+
+
+def coalesce_key(
+    state: AgentState, conversation_history: list[ConversationEntry]
+) -> str:
+    """Requests share a run only if everything that shapes the run matches:
+    the query, the prior turns, the reused research and the budget limits"""
+    history = [(entry.query, entry.summary) for entry in conversation_history]
+    limits = state.budget.dict(include=set(ResourceLimits.model_fields))
+    payload = json.dumps(
+        [normalize_query(state.task), history, state.memory.as_strings(), limits],
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key onto one running task"""
+
+    def __init__(self):
+        # key -> [task, callers waiting for it]
+        self._inflight: dict[str, list] = {}
+
+    async def run(self, key: str, factory: Callable[[], Awaitable]):
+        """Return ``(result, shared)``; ``shared`` is True for callers that attached"""
+        entry = self._inflight.get(key)
+        shared = entry is not None
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            entry = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda done: self._forget(key, done))
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # Shielded so a disconnecting caller does not cancel the run for the rest
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if entry[1] == 1:
+                # The last caller is gone; nobody is left to use the result
+                task.cancel()
+                self._forget(key, task)
+            raise
+        finally:
+            entry[1] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,405 @@
+"""
+Asynchronous query jobs backed by a durable SQLite queue.
+
+``POST /jobs`` stores the request and returns at once; a bounded pool of
+workers claims queued jobs by priority class and runs them through the graph.
+Jobs of one session run one at a time, in the order they were submitted.
+Claims are leases that running workers renew. If a worker dies (or the process
+restarts) its job is claimed again once the lease expires, and the graph
+resumes it from its checkpoint. Cancellation is a flag that workers check
+while the job runs.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from observability import JOB_QUEUE_WAIT, JOBS, log_event
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+PRIORITY_NAMES = {value: name for name, value in PRIORITIES.items()}
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "sessions/jobs.sqlite3")
+# Worker tasks in this process (0 only enqueues; another process works)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+# Queued jobs accepted before POST /jobs answers 429
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", 100))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 30))
+# Claims of one job before it is given up on as failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Finished jobs are deleted after this long
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", 24 * 3600))
+# How often workers delete expired jobs
+PRUNE_INTERVAL_SECONDS = min(JOB_RETENTION_SECONDS, 600)
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+class JobStore:
+    """Jobs table in SQLite; every state change is a single short transaction"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    session_id TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    lease_until REAL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_queue
+                    ON jobs (status, priority, created_at);
+                CREATE INDEX IF NOT EXISTS idx_jobs_session
+                    ON jobs (session_id, status);
+                CREATE INDEX IF NOT EXISTS idx_jobs_finished
+                    ON jobs (finished_at);
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA busy_timeout=30000")
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(
+        self, request: dict, priority: str, max_queued: int = JOB_MAX_QUEUED
+    ) -> str:
+        """Store a queued job and return its id; QueueFull past ``max_queued``"""
+        job_id = uuid.uuid4().hex
+        with self._transaction() as conn:
+            (queued,) = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued'"
+            ).fetchone()
+            if max_queued and queued >= max_queued:
+                raise QueueFull(f"{queued} jobs already queued")
+            conn.execute(
+                "INSERT INTO jobs (id, status, priority, session_id, request, "
+                "created_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (
+                    job_id,
+                    PRIORITIES[priority],
+                    request["session_id"],
+                    json.dumps(request),
+                    time.time(),
+                ),
+            )
+        return job_id
+
+    def claim(self) -> Optional[dict]:
+        """Lease the next job: highest priority, oldest first.
+
+        Running jobs whose lease ran out (their worker died) are claimed again,
+        until they have been tried ``JOB_MAX_ATTEMPTS`` times. A job waits
+        while another job of its session is running or was queued before it:
+        they share the session's history and checkpoint thread.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, "
+                "error = 'worker lost the job too many times' "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, JOB_MAX_ATTEMPTS),
+            )
+            row = conn.execute(
+                "SELECT id, priority, request, created_at, attempts FROM jobs AS job "
+                "WHERE (status = 'queued' OR (status = 'running' AND lease_until < ?)) "
+                "AND NOT EXISTS (SELECT 1 FROM jobs AS other "
+                "WHERE other.session_id = job.session_id AND other.id != job.id "
+                "AND (other.status = 'running' OR (other.status = 'queued' "
+                "AND other.created_at < job.created_at))) "
+                "ORDER BY priority, created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                "lease_until = ?, started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (now + JOB_LEASE_SECONDS, now, row[0]),
+            )
+        job_id, priority, request, created_at, attempts = row
+        return {
+            "id": job_id,
+            "priority": PRIORITY_NAMES[priority],
+            "request": json.loads(request),
+            "created_at": created_at,
+            # Identifies this claim; a later claim of the job supersedes it
+            "attempt": attempts + 1,
+        }
+
+    def heartbeat(self, job_id: str, attempt: int) -> bool:
+        """Renew the lease of a claim; True once the worker should stop,
+        because cancellation was asked or the lease was lost to another claim"""
+        with self._connect() as conn:
+            renewed = conn.execute(
+                "UPDATE jobs SET lease_until = ? "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (time.time() + JOB_LEASE_SECONDS, job_id, attempt),
+            ).rowcount
+            row = conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return not renewed or bool(row and row[0])
+
+    def finish(
+        self,
+        job_id: str,
+        attempt: int,
+        status: str,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+    ) -> bool:
+        """Record the outcome of a claim; False if the claim had been superseded"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, "
+                "lease_until = NULL "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                    attempt,
+                ),
+            )
+        return cursor.rowcount > 0
+
+    def release(self, job_id: str, attempt: int) -> None:
+        """Put a job whose worker is shutting down back in the queue"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL, "
+                "attempts = MAX(attempts - 1, 0) "
+                "WHERE id = ? AND status = 'running' AND attempts = ?",
+                (job_id, attempt),
+            )
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a queued job now, or flag a running one; returns its status"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT status FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] == "queued":
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                    "WHERE id = ?",
+                    (time.time(), job_id),
+                )
+                return "cancelled"
+            if row[0] == "running":
+                conn.execute(
+                    "UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,)
+                )
+            return row[0]
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, priority, result, error, attempts, "
+                "cancel_requested, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row[1] == "queued":
+                (position,) = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+                    "(priority < ? OR (priority = ? AND created_at < ?))",
+                    (row[2], row[2], row[7]),
+                ).fetchone()
+        (
+            job_id,
+            status,
+            priority,
+            result,
+            error,
+            attempts,
+            cancel_requested,
+            created_at,
+            started_at,
+            finished_at,
+        ) = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "priority": PRIORITY_NAMES[priority],
+            "queue_position": position,
+            "attempts": attempts,
+            "cancel_requested": bool(cancel_requested),
+            "created_at": _iso(created_at),
+            "started_at": _iso(started_at),
+            "finished_at": _iso(finished_at),
+            "result": json.loads(result) if result else None,
+            "error": error,
+        }
+
+    def prune(self, retention: float = JOB_RETENTION_SECONDS) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE finished_at < ?", (time.time() - retention,)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+
+JobRunner = Callable[[dict], Awaitable[dict]]
+
+
+class JobWorkers:
+    """Bounded pool of asyncio workers draining a ``JobStore``"""
+
+    def __init__(
+        self, store: JobStore, runner: JobRunner, workers: int = JOB_WORKERS
+    ):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pruned_at = 0.0
+
+    async def start(self) -> None:
+        if self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        await self._prune()
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake an idle worker after a job was queued in this process"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _prune(self) -> None:
+        """Delete jobs past their retention, at most every PRUNE_INTERVAL_SECONDS"""
+        if time.time() - self._pruned_at < PRUNE_INTERVAL_SECONDS:
+            return
+        self._pruned_at = time.time()
+        pruned = await asyncio.to_thread(self.store.prune)
+        if pruned:
+            log_event(logger, "jobs_pruned", count=pruned)
+
+    async def _work(self) -> None:
+        while True:
+            await self._prune()
+            job = await asyncio.to_thread(self.store.claim)
+            if job is None:
+                # Also polled, for jobs queued by other processes
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: dict) -> None:
+        job_id, attempt = job["id"], job["attempt"]
+        waited = time.time() - job["created_at"]
+        JOB_QUEUE_WAIT.observe(waited, priority=job["priority"])
+        log_event(logger, "job_started", job_id=job_id, priority=job["priority"])
+        task = asyncio.create_task(self.runner(job["request"]))
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=JOB_POLL_SECONDS)
+                if done:
+                    break
+                if await asyncio.to_thread(self.store.heartbeat, job_id, attempt):
+                    task.cancel()
+        except asyncio.CancelledError:
+            # Shutting down: the job goes back to the queue for the next start
+            task.cancel()
+            await asyncio.to_thread(self.store.release, job_id, attempt)
+            raise
+
+        status, result, error = "completed", None, None
+        if task.cancelled():
+            status = "cancelled"
+        elif task.exception() is not None:
+            # HTTPException from the query path carries its message in detail
+            status = "failed"
+            error = str(getattr(task.exception(), "detail", task.exception()))
+        else:
+            result = task.result()
+        recorded = await asyncio.to_thread(
+            self.store.finish, job_id, attempt, status, result, error
+        )
+        if not recorded:
+            # The lease ran out and another claim owns the job now
+            log_event(logger, "job_lease_lost", level=logging.WARNING, job_id=job_id)
+            return
+        JOBS.inc(status=status)
+        log_event(logger, "job_finished", job_id=job_id, status=status, error=error)
+
+
+def create_job_store(path: Optional[str] = None) -> JobStore:
+    return JobStore(Path(path or JOB_DB_PATH))
@@ -1,19 +1,37 @@
 __all__ = [
     "history_node",
+    "ahistory_node",
     "planner_node",
+    "aplanner_node",
     "researcher_node",
+    "aresearcher_node",
     "AgentState",
     "examiner_node",
+    "aexaminer_node",
     "summarizer_node",
+    "asummarizer_node",
+    "verified_summarizer_node",
+    "averified_summarizer_node",
     "examiner_decision",
+    "summary_decision",
     "planner_decision",
     "make_decision",
 ]
 
-from .examiner_node import examiner_node
-from .history_node import history_node
-from .planner_node import planner_node
-from .researcher_node import researcher_node
+from .examiner_node import aexaminer_node, examiner_node
+from .history_node import ahistory_node, history_node
+from .planner_node import aplanner_node, planner_node
+from .researcher_node import aresearcher_node, researcher_node
 from .state_agent import AgentState
-from .stopper_node import examiner_decision, make_decision, planner_decision
-from .summarizer_node import summarizer_node
+from .stopper_node import (
+    examiner_decision,
+    make_decision,
+    planner_decision,
+    summary_decision,
+)
+from .summarizer_node import (
+    asummarizer_node,
+    averified_summarizer_node,
+    summarizer_node,
+    verified_summarizer_node,
+)
@@ -1,25 +1,59 @@
-from langchain.chat_models import ChatOpenAI
+import logging
+import re
+
 from nodes.state_agent import AgentState
+from observability import EXAMINER_VERDICTS, log_event
+from tools.llm_cache import ainvoke_llm, invoke_llm
+from tools.prompt_budget import compact_memory, section_budget
 
-llm = ChatOpenAI(model="gpt-4.1-mini-2025-04-14", temperature=0.2)
+logger = logging.getLogger(__name__)
 
+_VERDICT_RE = re.compile(r"\b(incorrect|not correct|correct|planner)\b")
 
-def examiner_node(state: AgentState) -> AgentState:
-    prompt = (
+
+def build_examiner_prompt(state: AgentState) -> str:
+    memory = compact_memory(
+        state.memory.as_strings(), section_budget("examiner", state.task)
+    )
+    return (
         f"You are an examiner. You are given a task and a summary of the research. You need to decide if the summary is correct. "
         f"Task: {state.task}\n\n"
-        f"Summary: {state.memory}\n\n"
+        f"Summary: {memory}\n\n"
         "return 'correct' if the summary is correct, otherwise return 'planner' to replan and research the task again"
         "if the summary include (not specified in the research) return 'planner'"
         "otherwise return 'correct'"
     )
-    response = llm.invoke(prompt)
-    response_content = response.content
-    print(f"Examiner response: {response_content}")
-    if "correct" in response_content.lower():
+
+
+def parse_examiner_verdict(response_content: str) -> str:
+    """``correct`` only when the first verdict word is a standalone "correct"
+
+    A plain substring test would also accept "incorrect" and "not correct".
+    """
+    match = _VERDICT_RE.search(response_content.lower())
+    return "correct" if match and match.group(1) == "correct" else "planner"
+
+
+def apply_examiner_response(state: AgentState, response_content: str) -> AgentState:
+    if parse_examiner_verdict(response_content) == "correct":
         state.decision = "correct"
         state.current_state = "examined and its correct"
     else:
         state.decision = "planner"
         state.current_state = "examined and its not correct"
+        state.budget.examiner_retries += 1
+    EXAMINER_VERDICTS.inc(verdict=state.decision, source="examiner")
+    log_event(
+        logger, "examiner_verdict", verdict=state.decision, response=response_content
+    )
     return state
+
+
+def examiner_node(state: AgentState) -> AgentState:
+    content = invoke_llm("examiner", build_examiner_prompt(state))
+    return apply_examiner_response(state, content)
+
+
+async def aexaminer_node(state: AgentState) -> AgentState:
+    content = await ainvoke_llm("examiner", build_examiner_prompt(state))
+    return apply_examiner_response(state, content)
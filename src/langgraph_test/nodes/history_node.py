@@ -1,26 +1,44 @@
-from langchain.chat_models import ChatOpenAI
-from nodes.state_agent import AgentState
+from nodes.state_agent import AgentState, MemoryKind
+from tools.llm_cache import ainvoke_llm, invoke_llm
+from tools.history_index import HISTORY_TOP_K, relevant_turns, run_history
+from tools.prompt_budget import compact_memory, section_budget
 
-llm = ChatOpenAI(model="gpt-4.1-mini-2025-04-14", temperature=0.2)
 
-
-def history_node(state: AgentState) -> AgentState:
-    prompt = f"""
+def build_history_prompt(state: AgentState) -> str:
+    # Split the budget: two thirds for past turns, the rest for current research
+    budget = section_budget("history", state.task)
+    conversation_history = "\n\n".join(
+        relevant_turns(
+            state.session_id,
+            run_history(),
+            state.task,
+            HISTORY_TOP_K["history"],
+            budget * 2 // 3,
+            lambda entry: f"Q: {entry.query}\nA: {entry.summary}",
+        )
+    )
+    memory = compact_memory(state.memory.as_strings(), budget // 3)
+    return f"""
     You are a helpful assistant that can answer questions about the conversation history.
     The task is: {state.task}
-    The conversation history is: {state.conversation_history}
-    The research is: {state.memory}
+    The conversation history is: {conversation_history}
+    The research is: {memory}
     and return the answer to the task based on the conversation history.
     """
-    response = llm.invoke(prompt)
-    updated_state = AgentState(
-        task=state.task,
-        memory=state.memory + [f"History: {response.content}"],
-        next_action=state.next_action,
-        failed_attempts=state.failed_attempts,
-        decision=state.decision,
-        conversation_history=state.conversation_history,
-        session_id=state.session_id,
-        current_state="history was checked",
-    )
-    return updated_state
+
+
+def apply_history_response(state: AgentState, response_content: str) -> AgentState:
+    state.memory.add(MemoryKind.HISTORY, response_content)
+    state.research_terms = []
+    state.current_state = "history was checked"
+    return state
+
+
+def history_node(state: AgentState) -> AgentState:
+    content = invoke_llm("history", build_history_prompt(state))
+    return apply_history_response(state, content)
+
+
+async def ahistory_node(state: AgentState) -> AgentState:
+    content = await ainvoke_llm("history", build_history_prompt(state))
+    return apply_history_response(state, content)
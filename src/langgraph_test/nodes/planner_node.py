@@ -1,10 +1,19 @@
+import logging
+import os
 import re
 
-from langchain.chat_models import ChatOpenAI
-from nodes.state_agent import AgentState
-from nodes.stopper_node import make_decision
+from nodes.state_agent import AgentState, MemoryKind
+from nodes.stopper_node import fast_path_decision, make_decision
+from observability import log_event
+from tools.history_index import HISTORY_TOP_K, relevant_turns, run_history
+from tools.llm_cache import ainvoke_llm, invoke_llm
+from tools.prompt_budget import compact_memory, count_tokens, section_budget
 
-llm = ChatOpenAI(model="gpt-4.1-mini-2025-04-14", temperature=0.4)
+logger = logging.getLogger(__name__)
+
+# Fan-out mode: the planner may return several independent search terms at once
+FANOUT_ENABLED = os.getenv("PLANNER_FANOUT", "0") == "1"
+MAX_FANOUT_TERMS = int(os.getenv("PLANNER_MAX_TERMS", 4))
 
 
 def trim_quoted_text(s):
@@ -12,26 +21,72 @@ def trim_quoted_text(s):
     return match.group(1) if match else s
 
 
-def planner_node(state: AgentState) -> AgentState:
-    research_entries = [
-        entry for entry in state.memory if entry.startswith("Researcher found:")
-    ]
+def extract_search_terms(s, limit=MAX_FANOUT_TERMS):
+    """Return every distinct [bracketed] term in order, capped at ``limit``"""
+    terms = []
+    for term in re.findall(r"\[(.*?)\]", s):
+        term = term.strip()
+        if term and term.lower() not in (t.lower() for t in terms):
+            terms.append(term)
+    return terms[:limit]
+
+
+SINGLE_SEARCH_INSTRUCTIONS = (
+    "SEARCH INSTRUCTIONS:\n"
+    "If you need more information, provide ONE concise search term (1-3 words).\n"
+    "Examples: 'photosynthesis', 'Leo Messi', 'American Shorthair'\n\n"
+    "the search term should be inside a brackets:  [search term] "
+)
+
+FANOUT_SEARCH_INSTRUCTIONS = (
+    "SEARCH INSTRUCTIONS:\n"
+    "If you need more information, provide ALL the independent search terms that are "
+    f"still missing at once (at most {MAX_FANOUT_TERMS}), each 1-3 words.\n"
+    "Example: [capital France] [language Jordan]\n\n"
+    "each search term should be inside its own brackets:  [search term] "
+)
+
+
+def build_planner_prompt(state: AgentState) -> str:
 
     # Build conversation context
     conversation_context = ""
-    if state.conversation_history:
+    history = run_history()
+    if history:
         conversation_context = "\nCONVERSATION HISTORY:\n"
-        for i, entry in enumerate(
-            state.conversation_history[-3:], 1
-        ):  # Show last 3 conversations
-            conversation_context += f"{i}. Q: {entry.query}\n   A: {entry.summary[:100]}{'...' if len(entry.summary) > 100 else ''}\n"
+        turns = relevant_turns(
+            state.session_id,
+            history,
+            state.task,
+            HISTORY_TOP_K["planner"],
+            section_budget("planner", state.task) // 4,
+            lambda entry: f"Q: {entry.query}\n   A: {entry.summary[:100]}{'...' if len(entry.summary) > 100 else ''}\n",
+        )  # Most relevant conversations, latest included
+        for i, turn in enumerate(turns, 1):
+            conversation_context += f"{i}. {turn}"
         conversation_context += "\nUse this context to understand follow-up questions or related queries.\n\n"
 
+    memory_budget = section_budget("planner", state.task, conversation_context)
+    memory = compact_memory(state.run_memory(), memory_budget)
+    # Research reused from earlier turns may be unrelated to this task, so it
+    # gets what is left of the budget and never counts as gathered
+    prior_context = ""
+    if state.reused_research:
+        prior = compact_memory(
+            [f"Researcher found: {entry}" for entry in state.prior_research()],
+            max(memory_budget - sum(count_tokens(entry) for entry in memory), 0),
+        )
+        prior_context = (
+            "Prior context (research from earlier turns, may not cover this task):\n"
+            f"{prior}\n\n"
+        )
+
     prompt = (
         f"You are planning how to complete this task: '{state.task}'\n\n"
         f"conversation history: \n\n{conversation_context}"
-        f"Current research gathered:\n{state.memory}\n\n"
-        f"Research status: {len(research_entries)} pieces of information collected.\n\n"
+        f"{prior_context}"
+        f"Current research gathered:\n{memory}\n\n"
+        f"Research status: {state.gathered_research()} pieces of information collected.\n\n"
         f"last thing was checked: {state.current_state}\n\n"
         "STOPPING CONDITIONS:\n"
         "Reply with exactly 'STOP' if ANY of these conditions are met:\n"
@@ -47,10 +102,7 @@ def planner_node(state: AgentState) -> AgentState:
         "  → First research: 'capital France'\n"
         "  → Second research: 'language Jordan'\n\n"
         "Always check the Current research "
-        "SEARCH INSTRUCTIONS:\n"
-        "If you need more information, provide ONE concise search term (1-3 words).\n"
-        "Examples: 'photosynthesis', 'Leo Messi', 'American Shorthair'\n\n"
-        "the search term should be inside a brackets:  [search term] "
+        f"{FANOUT_SEARCH_INSTRUCTIONS if FANOUT_ENABLED else SINGLE_SEARCH_INSTRUCTIONS}"
         "This search will be used in wikipedia search, so it should be a wikipedia search term"
         "All questions should be answered before you stop"
         "Focus on what specific information is missing and provide the most relevant search term."
@@ -58,24 +110,52 @@ def planner_node(state: AgentState) -> AgentState:
         "After you check the history, if the task is still not answered, you should reply with your search term:  [search term]"
         "if the task is already answered in the conversation history, you should reply with 'STOP'"
     )
+    return prompt
+
 
-    response = llm.invoke(prompt)
-    trim_research_term = trim_quoted_text(response.content)
-    print(f"Planner response: {trim_research_term}")
+def apply_planner_response(state: AgentState, response_content: str) -> AgentState:
+    trim_research_term = trim_quoted_text(response_content)
+    research_terms = (
+        extract_search_terms(response_content) if FANOUT_ENABLED else []
+    )
+    if len(research_terms) > 1:
+        trim_research_term = " | ".join(research_terms)
+    log_event(logger, "planner_response", search_term=trim_research_term)
 
     # Decision logic - determine next step
     decision = make_decision(state, trim_research_term)
 
-    updated_state = AgentState(
-        task=state.task,
-        memory=state.memory + [f"Planner: {trim_research_term}"],
-        next_action=trim_research_term,
-        failed_attempts=state.failed_attempts,
-        decision=decision,
-        conversation_history=state.conversation_history,
-        session_id=state.session_id,
-        current_state="planner was done",
-    )
-    print(f"Planner decision: {decision}")
+    state.memory.add(MemoryKind.PLANNER, trim_research_term)
+    state.next_action = trim_research_term
+    state.decision = decision
+    state.current_state = "planner was done"
+    state.research_terms = research_terms
+
+    return state
+
+
+def apply_fast_path(state: AgentState, decision: str, rule: str) -> AgentState:
+    log_event(logger, "planner_fast_path", rule=rule, decision=decision)
+    state.decision = decision
+    state.current_state = f"planner fast path ({rule})"
+    state.research_terms = []
+    state.planner_path.append(rule)
+    return state
+
+
+def planner_node(state: AgentState) -> AgentState:
+    fast_path = fast_path_decision(state)
+    if fast_path:
+        return apply_fast_path(state, *fast_path)
+    state.planner_path.append("llm")
+    content = invoke_llm("planner", build_planner_prompt(state))
+    return apply_planner_response(state, content)
+
 
-    return updated_state
+async def aplanner_node(state: AgentState) -> AgentState:
+    fast_path = fast_path_decision(state)
+    if fast_path:
+        return apply_fast_path(state, *fast_path)
+    state.planner_path.append("llm")
+    content = await ainvoke_llm("planner", build_planner_prompt(state))
+    return apply_planner_response(state, content)
@@ -1,20 +1,45 @@
-from tools.wiki_tool import wiki_search
+from tools.passages import extract_passages
+from tools.prefetch import asearch_with_prefetch
+from tools.wiki_cache import is_negative_result
+from tools.wiki_tool import wiki_search_many
 
-from .state_agent import AgentState
+from .state_agent import AgentState, MemoryKind
 
 
-def researcher_node(state: AgentState) -> AgentState:
-    search_term = state.next_action.strip()
-    result = wiki_search(search_term)
+def research_search_terms(state: AgentState) -> list[str]:
+    return state.research_terms or [state.next_action.strip()]
+
+
+def apply_research_results(
+    state: AgentState, terms: list[str], results: list[str]
+) -> AgentState:
     # print(f"Researcher result: {result}")
-    if "No relevant result" in result:
+    if all(is_negative_result(result) for result in results):
         state.failed_attempts += 1
         state.current_state = "researcher failed, change the search term"
     else:
         state.failed_attempts = 0
         state.current_state = "researcher succeeded"
 
-    state.memory = state.memory + [f"Researcher found: {result}"]
+    # Results are appended in planner order so runs stay deterministic; only
+    # the passages relevant to the task and term are kept
+    for term, result in zip(terms, results):
+        state.memory.add(
+            MemoryKind.RESEARCH, extract_passages(result, state.task, term)
+        )
+    state.research_terms = []
     state.failed_attempts = state.failed_attempts
     state.current_state = "researcher succeeded"
     return state
+
+
+def researcher_node(state: AgentState) -> AgentState:
+    terms = research_search_terms(state)
+    results = wiki_search_many(terms)
+    return apply_research_results(state, terms, results)
+
+
+async def aresearcher_node(state: AgentState) -> AgentState:
+    terms = research_search_terms(state)
+    results = await asearch_with_prefetch(terms)
+    return apply_research_results(state, terms, results)
@@ -1,6 +1,8 @@
-from typing import List, Optional
+import time
+from enum import Enum
+from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 
 
 class ConversationEntry(BaseModel):
@@ -9,12 +11,167 @@ class ConversationEntry(BaseModel):
     timestamp: str
 
 
+class MemoryKind(str, Enum):
+    PLANNER = "planner"
+    RESEARCH = "research"
+    HISTORY = "history"
+    SUMMARY = "summary"
+
+
+# Prefixes used by the legacy list[str] memory, kept for the compatibility view
+MEMORY_PREFIXES = {
+    MemoryKind.PLANNER: "Planner: ",
+    MemoryKind.RESEARCH: "Researcher found: ",
+    MemoryKind.HISTORY: "History: ",
+    MemoryKind.SUMMARY: "Final Summary: ",
+}
+
+
+class MemoryEntry(BaseModel):
+    kind: MemoryKind
+    content: str
+
+    def render(self) -> str:
+        return f"{MEMORY_PREFIXES[self.kind]}{self.content}"
+
+
+class AgentMemory(BaseModel):
+    """Append-only run memory with per-kind collections.
+
+    ``entries`` keeps the overall order and is all that gets serialized; the
+    private ``_by_kind`` index groups the same contents by kind so counts and
+    lookups never rescan the whole list, and is rebuilt on load.
+    """
+
+    entries: list[MemoryEntry] = []
+    _by_kind: dict[MemoryKind, list[str]] = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context) -> None:
+        for entry in self.entries:
+            self._by_kind.setdefault(entry.kind, []).append(entry.content)
+
+    def add(self, kind: MemoryKind, content: str) -> None:
+        self.entries.append(MemoryEntry(kind=kind, content=content))
+        self._by_kind.setdefault(kind, []).append(content)
+
+    def count(self, kind: MemoryKind) -> int:
+        return len(self._by_kind.get(kind, ()))
+
+    def contents(self, kind: MemoryKind) -> list[str]:
+        return self._by_kind.get(kind, [])
+
+    def as_strings(self) -> list[str]:
+        """Legacy view: each entry rendered with its string prefix"""
+        return [entry.render() for entry in self.entries]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def from_strings(cls, memory: list[str]) -> "AgentMemory":
+        agent_memory = cls()
+        for entry in memory:
+            for kind, prefix in MEMORY_PREFIXES.items():
+                if entry.startswith(prefix):
+                    agent_memory.add(kind, entry[len(prefix) :])
+                    break
+            else:
+                agent_memory.add(MemoryKind.HISTORY, entry)
+        return agent_memory
+
+
+class ResourceLimits(BaseModel):
+    """Run limits; ``None`` leaves a resource unlimited"""
+
+    deadline_seconds: Optional[float] = None
+    max_llm_calls: Optional[int] = None
+    max_tokens: Optional[int] = None
+    max_examiner_retries: Optional[int] = None
+
+
+class BudgetLimits(ResourceLimits):
+    """Limits a request may set; omitted ones keep the server defaults.
+
+    Only the server may leave a resource unlimited, so ``null`` is rejected.
+    """
+
+    @field_validator("*")
+    @classmethod
+    def _reject_unlimited(cls, value):
+        if value is None:
+            raise ValueError("omit the limit to keep the server default")
+        return value
+
+
+class RunBudget(ResourceLimits):
+    """Limits of one run plus what it has used so far"""
+
+    started_at: float = Field(default_factory=time.time)
+    llm_calls: int = 0
+    tokens: int = 0
+    examiner_retries: int = 0
+    # First limit that ran out, once one has
+    exhausted: Optional[str] = None
+
+    def check(self) -> Optional[str]:
+        """Name of a limit that has run out, or None"""
+        if (
+            self.deadline_seconds is not None
+            and time.time() - self.started_at >= self.deadline_seconds
+        ):
+            return "deadline"
+        if self.max_llm_calls is not None and self.llm_calls >= self.max_llm_calls:
+            return "llm_calls"
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return "tokens"
+        if (
+            self.max_examiner_retries is not None
+            and self.examiner_retries > self.max_examiner_retries
+        ):
+            return "examiner_retries"
+        return None
+
+    def usage(self) -> dict:
+        return {
+            "elapsed_seconds": round(time.time() - self.started_at, 3),
+            "llm_calls": self.llm_calls,
+            "tokens": self.tokens,
+            "examiner_retries": self.examiner_retries,
+            "exhausted": self.exhausted,
+            "limits": self.dict(include=set(ResourceLimits.model_fields)),
+        }
+
+
 class AgentState(BaseModel):
     task: str
-    memory: list[str]
+    memory: AgentMemory
     next_action: str
     failed_attempts: int
     decision: str
-    conversation_history: List[ConversationEntry] = []
     session_id: Optional[str] = None
     current_state: str = "just started"
+    research_terms: list[str] = []
+    # One entry per planner step: "llm" or the fast-path rule that decided it
+    planner_path: list[str] = []
+    # Research entries carried over from the session's previous run
+    reused_research: int = 0
+    budget: RunBudget = Field(default_factory=RunBudget)
+
+    def gathered_research(self) -> int:
+        """Research entries collected by this run, excluding reused ones"""
+        return self.memory.count(MemoryKind.RESEARCH) - self.reused_research
+
+    def prior_research(self) -> list[str]:
+        """Research carried over from the session's previous run"""
+        return self.memory.contents(MemoryKind.RESEARCH)[: self.reused_research]
+
+    def run_memory(self) -> list[str]:
+        """Legacy view of this run's own entries; reused research comes first"""
+        return self.memory.as_strings()[self.reused_research :]
+
+    @field_validator("memory", mode="before")
+    @classmethod
+    def _accept_legacy_memory(cls, value):
+        if isinstance(value, list):
+            return AgentMemory.from_strings(value)
+        return value
@@ -1,4 +1,22 @@
-from nodes.state_agent import AgentState
+import logging
+import os
+from typing import Optional
+
+from nodes.state_agent import AgentState, MemoryKind
+from observability import PLANNER_DECISIONS, log_event
+from tools.history_index import history_indexes, run_history
+
+logger = logging.getLogger(__name__)
+
+# Fast-path rules run before the planner LLM; PLANNER_FAST_PATH=none disables them
+FAST_PATH_RESEARCH_ENTRIES = int(os.getenv("FAST_PATH_RESEARCH_ENTRIES", 3))
+FAST_PATH_FAILED_ATTEMPTS = int(os.getenv("FAST_PATH_FAILED_ATTEMPTS", 3))
+
+
+def _route(decision: str, reason: str) -> str:
+    PLANNER_DECISIONS.inc(decision=decision, reason=reason)
+    log_event(logger, "planner_decision", decision=decision, reason=reason)
+    return decision
 
 
 def make_decision(state: AgentState, planner_response: str) -> str:
@@ -6,35 +24,76 @@ def make_decision(state: AgentState, planner_response: str) -> str:
 
     # Check if planner explicitly said to stop
     if "stop" in planner_response.lower():
-        print("🛑 Planner decided to stop - Moving to summarizer...")
-        return "summarize"
-
-    research_entries = [
-        entry for entry in state.memory if entry.startswith("Researcher found:")
-    ]
+        return _route("summarize", "planner_stop")
 
     # Auto-stop conditions
-    if len(research_entries) >= 7:
-        print(
-            "🛑🛑 Auto-stopping: Gathered sufficient information (5+ research results)"
-        )
-        return "summarize"
+    if state.gathered_research() >= 7:
+        return _route("summarize", "research_limit")
 
-    if len(state.memory) > 12:
-        print(
-            "🛑🛑🛑 Auto-stopping: Gathered sufficient information (12+ research results)"
-        )
-        return "summarize"
+    # Research reused from the previous run does not count towards the cap
+    if len(state.memory) - state.reused_research > 12:
+        return _route("summarize", "memory_limit")
 
     if state.failed_attempts >= 3:
-        print("🛑🛑🛑🛑 Auto-stopping: Too many failed attempts")
-        return "summarize"
+        return _route("summarize", "failed_attempts")
 
     if "check_history" in planner_response.lower():
-        return "history"
+        return _route("history", "planner_check_history")
 
-    # print("📚 Continuing research...")
-    return "research"
+    return _route("research", "planner_search_term")
+
+
+def _research_collected(state: AgentState) -> Optional[str]:
+    if state.gathered_research() >= FAST_PATH_RESEARCH_ENTRIES:
+        return "summarize"
+    return None
+
+
+def _research_failed(state: AgentState) -> Optional[str]:
+    if state.failed_attempts >= FAST_PATH_FAILED_ATTEMPTS:
+        return "summarize"
+    return None
+
+
+def _history_match(state: AgentState) -> Optional[str]:
+    index = history_indexes.get(state.session_id, run_history())
+    if index.find_query(state.task) is None:
+        return None
+    # Answer from history once, then summarize what it returned
+    return "summarize" if state.memory.count(MemoryKind.HISTORY) else "history"
+
+
+FAST_PATH_RULES = {
+    "research_collected": _research_collected,
+    "research_failed": _research_failed,
+    "history_match": _history_match,
+}
+
+
+def enabled_fast_path_rules() -> list[str]:
+    names = os.getenv("PLANNER_FAST_PATH", ",".join(FAST_PATH_RULES))
+    if names.strip().lower() in ("", "none", "0"):
+        return []
+    rules = [name.strip() for name in names.split(",") if name.strip()]
+    unknown = [name for name in rules if name not in FAST_PATH_RULES]
+    if unknown:
+        raise ValueError(f"Unknown PLANNER_FAST_PATH rules: {', '.join(unknown)}")
+    return rules
+
+
+FAST_PATH_ENABLED = enabled_fast_path_rules()
+
+
+def fast_path_decision(state: AgentState) -> Optional[tuple[str, str]]:
+    """Return ``(decision, rule)`` when a rule settles the step without the LLM"""
+    # The examiner rejected the last answer; replanning needs the LLM
+    if state.decision == "planner":
+        return None
+    for name in FAST_PATH_ENABLED:
+        decision = FAST_PATH_RULES[name](state)
+        if decision:
+            return _route(decision, f"fast_path_{name}"), name
+    return None
 
 
 def planner_decision(state: AgentState) -> str:
@@ -45,3 +104,10 @@ def planner_decision(state: AgentState) -> str:
 def examiner_decision(state: AgentState) -> str:
     """Decision function for conditional edges"""
     return state.decision
+
+
+def summary_decision(state: AgentState) -> str:
+    """Decision function after the combined summarize-and-verify node"""
+    if state.budget.exhausted:
+        return "budget_exhausted"
+    return state.decision
@@ -1,30 +1,61 @@
-from langchain.chat_models import ChatOpenAI
+import logging
+import os
+import re
+from typing import Literal
 
-from .state_agent import AgentState
+from observability import EXAMINER_VERDICTS, log_event
+from pydantic import BaseModel, Field, ValidationError
+from tools.history_index import HISTORY_TOP_K, relevant_turns, run_history
+from tools.llm_cache import ainvoke_llm, invoke_llm
+from tools.prompt_budget import compact_memory, section_budget
 
-llm = ChatOpenAI(model="gpt-4.1-mini-2025-04-14", temperature=0)
+from .state_agent import AgentState, MemoryKind
 
+logger = logging.getLogger(__name__)
+
+# Combined variant: verdicts below this confidence still go to the examiner
+VERIFY_CONFIDENCE_THRESHOLD = float(os.getenv("VERIFY_CONFIDENCE_THRESHOLD", 0.7))
+
+
+class SummaryVerdict(BaseModel):
+    """Answer plus the summarizer's own check of it against the task"""
+
+    summary: str
+    verdict: Literal["complete", "incomplete"]
+    confidence: float = Field(ge=0, le=1)
+    # Sub-questions of the task the research does not answer
+    missing: list[str] = []
 
-def summarizer_node(state: AgentState) -> AgentState:
-    research_entries = [
-        entry for entry in state.memory if entry.startswith("Researcher found:")
-    ]
-    research_data = "\n\n".join(
-        [entry.replace("Researcher found: ", "") for entry in research_entries]
-    )
 
+def build_summarizer_prompt(state: AgentState) -> str:
     # Add conversation context if available
     conversation_context = ""
-    if state.conversation_history:
+    history = run_history()
+    if history:
         conversation_context = "\n\nCONVERSATION CONTEXT:\n"
-        for entry in state.conversation_history[
-            -2:
-        ]:  # Last 2 conversations for context
-            conversation_context += (
-                f"Previous Q: {entry.query}\nPrevious A: {entry.summary}\n\n"
+        conversation_context += "".join(
+            relevant_turns(
+                state.session_id,
+                history,
+                state.task,
+                HISTORY_TOP_K["summarizer"],
+                section_budget("summarizer", state.task) // 4,
+                lambda entry: f"Previous Q: {entry.query}\nPrevious A: {entry.summary}\n\n",
             )
+        )  # Most relevant conversations for context
         conversation_context += "Use this context to provide a more coherent answer that builds on previous discussions.\n"
 
+    research_entries = compact_memory(
+        [
+            f"Researcher found: {entry}"
+            for entry in state.memory.contents(MemoryKind.RESEARCH)
+        ],
+        section_budget("summarizer", state.task, conversation_context),
+    )
+    research_data = "\n\n".join(
+        [entry.replace("Researcher found: ", "") for entry in research_entries]
+    )
+
     prompt = (
         f"Based on the research gathered, provide a concise and clear answer to: '{state.task}'\n\n"
         f"Research data:\n{research_data}\n\n"
@@ -34,11 +65,79 @@ def summarizer_node(state: AgentState) -> AgentState:
         "Do not include any information that was not found in the research. "
         "If this is a follow-up question, acknowledge the connection to previous discussions."
     )
+    return prompt
 
-    response = llm.invoke(prompt)
-    summary = response.content
 
+def apply_summarizer_response(state: AgentState, summary: str) -> AgentState:
     state.next_action = "COMPLETED"
-    state.memory = state.memory + [f"Final Summary: {summary}"]
+    state.memory.add(MemoryKind.SUMMARY, summary)
     state.current_state = "summarizer was done"
     return state
+
+
+def summarizer_node(state: AgentState) -> AgentState:
+    content = invoke_llm("summarizer", build_summarizer_prompt(state))
+    return apply_summarizer_response(state, content)
+
+
+async def asummarizer_node(state: AgentState) -> AgentState:
+    content = await ainvoke_llm("summarizer", build_summarizer_prompt(state))
+    return apply_summarizer_response(state, content)
+
+
+VERIFY_INSTRUCTIONS = (
+    "\n\nThen check your answer against the task. Set verdict to 'complete' if "
+    "the research answers every part of the task, otherwise 'incomplete' and "
+    "list the unanswered sub-questions in missing. Set confidence between 0 and "
+    "1 to how sure you are of the verdict. Reply with JSON only: "
+    '{"summary": "...", "verdict": "complete", "confidence": 0.9, "missing": []}'
+)
+
+
+def parse_summary_verdict(content: str) -> SummaryVerdict:
+    """Parse the structured reply; free text becomes an unverified summary"""
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", content.strip())
+    try:
+        return SummaryVerdict.model_validate_json(text)
+    except ValidationError:
+        # Zero confidence sends the answer to the examiner
+        return SummaryVerdict(summary=content, verdict="complete", confidence=0.0)
+
+
+def apply_verified_summary(state: AgentState, content: str) -> AgentState:
+    result = parse_summary_verdict(content)
+    apply_summarizer_response(state, result.summary)
+    if result.verdict == "incomplete":
+        state.decision = "planner"
+        state.current_state = "summary incomplete, missing: " + (
+            "; ".join(result.missing) or "unspecified"
+        )
+        state.budget.examiner_retries += 1
+    elif result.confidence >= VERIFY_CONFIDENCE_THRESHOLD:
+        state.decision = "correct"
+        state.current_state = "summarized and verified"
+    else:
+        state.decision = "examiner"
+        state.current_state = "summarized, verdict needs the examiner"
+    EXAMINER_VERDICTS.inc(verdict=state.decision, source="summarizer")
+    log_event(
+        logger,
+        "summary_verdict",
+        verdict=result.verdict,
+        confidence=result.confidence,
+        missing=result.missing,
+        decision=state.decision,
+    )
+    return state
+
+
+def verified_summarizer_node(state: AgentState) -> AgentState:
+    prompt = build_summarizer_prompt(state) + VERIFY_INSTRUCTIONS
+    content = invoke_llm("summarizer", prompt, schema=SummaryVerdict)
+    return apply_verified_summary(state, content)
+
+
+async def averified_summarizer_node(state: AgentState) -> AgentState:
+    prompt = build_summarizer_prompt(state) + VERIFY_INSTRUCTIONS
+    content = await ainvoke_llm("summarizer", prompt, schema=SummaryVerdict)
+    return apply_verified_summary(state, content)
@@ -0,0 +1,256 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Session id of the request being processed; copied into async tasks and
+# LangGraph node runs, so logs emitted anywhere below app.py carry it.
+session_id_var: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+# Profile of the request being processed, when profiling was requested
+# (see profiling.py); ``span`` records into it and is a no-op otherwise.
+profile_var: ContextVar = ContextVar("profile", default=None)
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _SessionFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, "session_id"):
+            record.session_id = session_id_var.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, event, session_id + fields"""
+
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+            "session_id": getattr(record, "session_id", None),
+        }
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter())
+    handler.addFilter(_SessionFilter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO"))
+
+
+def log_event(logger: logging.Logger, event: str, level=logging.INFO, **fields):
+    """Emit a structured log record; ``fields`` become top-level JSON keys"""
+    logger.log(level, event, extra={"fields": fields})
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _format_labels(key, (("le", bound),))
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(key, (("le", "+Inf"),))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+NODE_DURATION = Histogram(
+    "agent_node_duration_seconds", "Wall time spent in each graph node"
+)
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds", "Wall time of LLM calls per node"
+)
+LLM_PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Prompt tokens sent per node")
+LLM_COMPLETION_TOKENS = Counter(
+    "llm_completion_tokens_total", "Completion tokens received per node"
+)
+LLM_CACHE_HITS = Counter(
+    "llm_cache_hits_total", "LLM calls answered from the response cache"
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total", "LLM calls retried after a 429, 5xx or connection error"
+)
+LLM_RATE_LIMIT_WAIT = Histogram(
+    "llm_rate_limit_wait_seconds", "Time LLM calls queued for the shared rate limit"
+)
+WIKI_DURATION = Histogram(
+    "wiki_search_duration_seconds", "Wall time of wiki_search by result source"
+)
+WIKI_PREFETCH = Counter(
+    "wiki_prefetch_total", "Speculative Wikipedia prefetches by outcome"
+)
+LOOP_ITERATIONS = Histogram(
+    "agent_loop_iterations",
+    "Planner iterations per request",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20),
+)
+EXAMINER_VERDICTS = Counter("examiner_verdicts_total", "Examiner verdicts by outcome")
+PLANNER_DECISIONS = Counter(
+    "planner_decisions_total", "Routing decisions from make_decision by reason"
+)
+BUDGET_EXHAUSTED = Counter(
+    "budget_exhausted_total", "Runs cut short by their request budget, by limit"
+)
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests_total", "Query requests served by another in-flight run"
+)
+PROFILED_REQUESTS = Counter(
+    "profiled_requests_total", "Requests profiled, by what asked for the profile"
+)
+JOBS = Counter("jobs_total", "Query jobs by outcome (queued, rejected, finished)")
+JOB_QUEUE_WAIT = Histogram(
+    "job_queue_wait_seconds", "Time jobs waited in the queue, by priority class"
+)
+REQUEST_DURATION = Histogram(
+    "query_request_duration_seconds", "End-to-end wall time of query requests"
+)
+
+REGISTRY = [
+    NODE_DURATION,
+    LLM_DURATION,
+    LLM_PROMPT_TOKENS,
+    LLM_COMPLETION_TOKENS,
+    LLM_CACHE_HITS,
+    LLM_RETRIES,
+    LLM_RATE_LIMIT_WAIT,
+    WIKI_DURATION,
+    WIKI_PREFETCH,
+    LOOP_ITERATIONS,
+    EXAMINER_VERDICTS,
+    PLANNER_DECISIONS,
+    BUDGET_EXHAUSTED,
+    COALESCED_REQUESTS,
+    PROFILED_REQUESTS,
+    JOBS,
+    JOB_QUEUE_WAIT,
+    REQUEST_DURATION,
+]
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """Time a block into the request's profile timeline.
+
+    Yields a dict the block may fill with extra fields for the span.
+    """
+    profile = profile_var.get()
+    fields: dict = {}
+    if profile is None:
+        yield fields
+        return
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        profile.add_span(kind, name, start, time.perf_counter(), **fields)
+
+
+def instrument_node(name: str, func):
+    """Wrap a sync or async node so its wall time lands in NODE_DURATION"""
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(state):
+            start = time.perf_counter()
+            try:
+                with span("node", name):
+                    return await func(state)
+            finally:
+                NODE_DURATION.observe(time.perf_counter() - start, node=name)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(state):
+        start = time.perf_counter()
+        try:
+            with span("node", name):
+                return func(state)
+        finally:
+            NODE_DURATION.observe(time.perf_counter() - start, node=name)
+
+    return wrapper
@@ -0,0 +1,244 @@
+"""
+Opt-in per-request profiling.
+
+With ``PROFILE_ON_DEMAND=1`` a request is profiled when it sends
+``X-Profile: 1`` or ``?profile=1``, and with ``PROFILE_SAMPLE_RATE`` when it is
+picked by sampling; both are off by default. While it runs, a sampler thread
+records the Python stacks of every thread at ``PROFILE_INTERVAL_MS``, and
+``observability.span`` records a timeline of graph nodes, LLM calls,
+Wikipedia calls and session I/O. The profile is saved under a profile id and
+served as JSON or as folded stacks, the input format of ``flamegraph.pl``,
+speedscope and most flamegraph viewers.
+
+Samples cover the whole process, so requests running concurrently with a
+profiled one show up in its flamegraph; the span timeline is per request.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from observability import PROFILED_REQUESTS, log_event, profile_var
+
+logger = logging.getLogger(__name__)
+
+# Header and query-flag profiling; any client can ask, so it is off by default
+PROFILE_ON_DEMAND = os.getenv("PROFILE_ON_DEMAND", "0") == "1"
+# Fraction of requests profiled without being asked
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Profiles kept on disk; the oldest are deleted first
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 100))
+MAX_STACK_DEPTH = 128
+
+# Leaf frames of a thread that is blocked rather than running Python code
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+def profile_reason(
+    header: Optional[str], flag: bool, sample_rate: float = PROFILE_SAMPLE_RATE
+) -> Optional[str]:
+    """Why this request should be profiled, or None when it should not"""
+    if PROFILE_ON_DEMAND and header and header.lower() in ("1", "true", "yes"):
+        return "header"
+    if PROFILE_ON_DEMAND and flag:
+        return "flag"
+    if sample_rate > 0 and random.random() < sample_rate:
+        return "sampled"
+    return None
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class Profile:
+    """Stack samples and span timeline of one request"""
+
+    def __init__(self, reason: str, **meta):
+        self.id = uuid.uuid4().hex
+        self.reason = reason
+        self.meta = meta
+        self.started_at = datetime.now().isoformat()
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.duration = 0.0
+        self.cpu_seconds = 0.0
+        self.samples: Counter = Counter()
+        self.idle_samples: Counter = Counter()
+        self.spans: list[dict] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, kind: str, name: str, start: float, end: float, **fields):
+        with self._lock:
+            self.spans.append(
+                {
+                    "kind": kind,
+                    "name": name,
+                    "start": round(start - self.start, 6),
+                    "duration": round(end - start, 6),
+                    **fields,
+                }
+            )
+
+    def add_sample(self, stack: str, idle: bool) -> None:
+        with self._lock:
+            (self.idle_samples if idle else self.samples)[stack] += 1
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.start
+        self.cpu_seconds = time.process_time() - self.cpu_start
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "reason": self.reason,
+                "started_at": self.started_at,
+                "duration": round(self.duration, 6),
+                "cpu_seconds": round(self.cpu_seconds, 6),
+                "interval_ms": PROFILE_INTERVAL_MS,
+                **self.meta,
+                "spans": sorted(self.spans, key=lambda span: span["start"]),
+                "samples": dict(self.samples),
+                "idle_samples": dict(self.idle_samples),
+            }
+
+
+class Sampler:
+    """One background thread sampling all stacks while any profile is active"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: set[Profile] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="profile-sampler", daemon=True
+                )
+                self._thread.start()
+
+    def remove(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                profiles = list(self._profiles)
+                if not profiles:
+                    self._thread = None
+                    return
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                idle = (Path(frame.f_code.co_filename).name, frame.f_code.co_name)
+                frames = []
+                while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                    frames.append(_frame_label(frame))
+                    frame = frame.f_back
+                frames.append(names.get(ident, f"thread-{ident}"))
+                stack = ";".join(reversed(frames))
+                for profile in profiles:
+                    profile.add_sample(stack, idle in IDLE_FRAMES)
+            time.sleep(self.interval)
+
+
+sampler = Sampler(PROFILE_INTERVAL_MS / 1000)
+
+
+class ProfileStore:
+    """Finished profiles as ``<id>.json`` files, newest ``keep`` retained"""
+
+    def __init__(self, directory: str, keep: int = PROFILE_KEEP):
+        self.directory = Path(directory)
+        self.keep = keep
+
+    def _path(self, profile_id: str) -> Path:
+        if not profile_id.isalnum():
+            raise KeyError(profile_id)
+        return self.directory / f"{profile_id}.json"
+
+    def save(self, profile: Profile) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(profile.id)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(profile.to_dict()))
+        tmp.replace(path)
+        saved = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for old in saved[: max(0, len(saved) - self.keep)]:
+            old.unlink(missing_ok=True)
+
+    def load(self, profile_id: str) -> Optional[dict]:
+        try:
+            return json.loads(self._path(profile_id).read_text())
+        except (KeyError, FileNotFoundError):
+            return None
+
+
+profile_store = ProfileStore(PROFILE_DIR)
+
+
+def folded_stacks(profile: dict, idle: bool = True) -> str:
+    """Profile samples as ``frame;frame;frame count`` lines"""
+    samples = Counter(profile["samples"])
+    if idle:
+        samples.update(profile["idle_samples"])
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+@asynccontextmanager
+async def profiled(reason: Optional[str], **meta):
+    """Profile the block when ``reason`` is set; yields the Profile or None.
+
+    The profile is saved in a worker thread when the block exits, including
+    on errors.
+    """
+    if reason is None:
+        yield None
+        return
+    profile = Profile(reason, **meta)
+    PROFILED_REQUESTS.inc(reason=reason)
+    token = profile_var.set(profile)
+    sampler.add(profile)
+    try:
+        yield profile
+    finally:
+        sampler.remove(profile)
+        profile_var.reset(token)
+        profile.finish()
+        try:
+            await asyncio.to_thread(profile_store.save, profile)
+            log_event(
+                logger,
+                "profile_saved",
+                profile_id=profile.id,
+                duration=round(profile.duration, 3),
+            )
+        except OSError as e:
+            log_event(logger, "profile_save_failed", level=logging.ERROR, error=str(e))
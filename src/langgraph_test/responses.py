@@ -0,0 +1,85 @@
+"""
+The query response model and its shaping for the query and history
+endpoints: field selection, history cursors and gzip for large bodies.
+"""
+
+import base64
+import binascii
+import os
+from typing import Iterable, List, Optional
+
+from nodes.state_agent import ConversationEntry
+from pydantic import BaseModel
+from starlette.middleware.gzip import GZipMiddleware
+
+# Bodies smaller than this are sent uncompressed (0 disables gzip)
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+# Streaming endpoints flush line by line, which gzip would hold back
+STREAMING_PATHS = frozenset({"/query/stream", "/query/batch"})
+
+# Default history page size for /sessions/{id}/history
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 100))
+
+
+def _env_list(name: str) -> Optional[list[str]]:
+    value = os.getenv(name, "")
+    return [item.strip() for item in value.split(",") if item.strip()] or None
+
+
+class QueryResponse(BaseModel):
+    query: str
+    summary: str
+    research_count: int
+    memory: list[str]
+    status: str
+    session_id: str
+    conversation_history: List[ConversationEntry] = []
+    budget: Optional[dict] = None
+    history_cursor: Optional[str] = None
+
+
+def unknown_fields(fields: Optional[Iterable[str]], known: Iterable[str]) -> list[str]:
+    return sorted(set(fields or ()) - set(known))
+
+
+def default_response_fields() -> Optional[list[str]]:
+    fields = _env_list("QUERY_RESPONSE_FIELDS")
+    unknown = unknown_fields(fields, QueryResponse.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown QUERY_RESPONSE_FIELDS: {', '.join(unknown)}")
+    return fields
+
+
+# Server defaults for requests that do not choose (unset = everything)
+QUERY_RESPONSE_FIELDS = default_response_fields()
+QUERY_HISTORY_LIMIT = (
+    int(os.getenv("QUERY_HISTORY_LIMIT")) if os.getenv("QUERY_HISTORY_LIMIT") else None
+)
+
+
+def encode_cursor(position: int) -> str:
+    """Opaque cursor for the history entries before ``position``"""
+    return base64.urlsafe_b64encode(f"h:{position}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Position encoded by ``encode_cursor``; ValueError if it is not a cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    prefix, _, position = raw.partition(":")
+    if prefix != "h" or not position.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return int(position)
+
+
+class QueryGZipMiddleware(GZipMiddleware):
+    """GZip for regular responses; streaming endpoints pass through untouched"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in STREAMING_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
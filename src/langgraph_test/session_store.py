@@ -0,0 +1,319 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from nodes.state_agent import ConversationEntry
+from observability import log_event
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore(ABC):
+    """Interface shared by the session backends used by app.py"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> List[ConversationEntry]: ...
+
+    def load_page(
+        self, session_id: str, limit: int, before: Optional[int] = None
+    ) -> Tuple[List[ConversationEntry], int, int]:
+        """Up to ``limit`` entries ending just before position ``before``.
+
+        Returns ``(entries, start, total)``: the page in chronological order,
+        the position of its first entry and the session's entry count. Without
+        ``before`` the page ends at the latest entry.
+        """
+        history = self.load(session_id)
+        end = len(history) if before is None else max(0, min(before, len(history)))
+        start = max(0, end - limit)
+        return history[start:end], start, len(history)
+
+    @abstractmethod
+    def append(self, session_id: str, entry: ConversationEntry) -> None: ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None: ...
+
+    @abstractmethod
+    def list_sessions(self, limit: int = 100, offset: int = 0) -> List[dict]: ...
+
+    @abstractmethod
+    def count_sessions(self) -> int: ...
+
+
+class FileSessionStore(SessionStore):
+    """Original layout: one JSON list per session in ``directory``"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.json"
+
+    def _lock(self, session_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    def load(self, session_id: str) -> List[ConversationEntry]:
+        session_file = self._path(session_id)
+        if session_file.exists():
+            try:
+                with open(session_file, "r") as f:
+                    return [ConversationEntry(**entry) for entry in json.load(f)]
+            except Exception as e:
+                log_event(
+                    logger, "session_load_failed", level=logging.ERROR, error=str(e)
+                )
+        return []
+
+    def append(self, session_id: str, entry: ConversationEntry) -> None:
+        with self._lock(session_id):
+            history = self.load(session_id) + [entry]
+            tmp_file = self._path(session_id).with_suffix(".json.tmp")
+            with open(tmp_file, "w") as f:
+                json.dump([e.dict() for e in history], f, indent=2)
+            os.replace(tmp_file, self._path(session_id))
+
+    def delete(self, session_id: str) -> None:
+        self._path(session_id).unlink(missing_ok=True)
+
+    def list_sessions(self, limit: int = 100, offset: int = 0) -> List[dict]:
+        sessions = []
+        for session_file in sorted(self.directory.glob("*.json"))[
+            offset : offset + limit
+        ]:
+            history = self.load(session_file.stem)
+            if history:
+                sessions.append(
+                    {
+                        "session_id": session_file.stem,
+                        "conversation_count": len(history),
+                        "last_query": history[-1].query,
+                        "last_timestamp": history[-1].timestamp,
+                    }
+                )
+        return sessions
+
+    def count_sessions(self) -> int:
+        return sum(1 for _ in self.directory.glob("*.json"))
+
+
+class SQLiteSessionStore(SessionStore):
+    """Append-only SQLite store with a per-session metadata row.
+
+    Entries are inserted, never rewritten, and ``sessions`` keeps the count and
+    last query so listing does not touch the entries table. WAL mode plus
+    ``BEGIN IMMEDIATE`` make concurrent writers across uvicorn workers safe.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS conversation_entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    timestamp TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_session_ts
+                    ON conversation_entries (session_id, timestamp);
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    conversation_count INTEGER NOT NULL,
+                    last_query TEXT,
+                    last_timestamp TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_sessions_last_ts
+                    ON sessions (last_timestamp);
+                CREATE TABLE IF NOT EXISTS store_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA busy_timeout=30000")
+            yield conn
+        finally:
+            conn.close()
+
+    def load(self, session_id: str) -> List[ConversationEntry]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT query, summary, timestamp FROM conversation_entries "
+                "WHERE session_id = ? ORDER BY timestamp, id",
+                (session_id,),
+            ).fetchall()
+        return [
+            ConversationEntry(query=query, summary=summary, timestamp=timestamp)
+            for query, summary, timestamp in rows
+        ]
+
+    def load_page(
+        self, session_id: str, limit: int, before: Optional[int] = None
+    ) -> Tuple[List[ConversationEntry], int, int]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT conversation_count FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            total = row[0] if row else 0
+            end = total if before is None else max(0, min(before, total))
+            start = max(0, end - limit)
+            rows = conn.execute(
+                "SELECT query, summary, timestamp FROM conversation_entries "
+                "WHERE session_id = ? ORDER BY timestamp, id LIMIT ? OFFSET ?",
+                (session_id, end - start, start),
+            ).fetchall()
+        entries = [
+            ConversationEntry(query=query, summary=summary, timestamp=timestamp)
+            for query, summary, timestamp in rows
+        ]
+        return entries, start, total
+
+    def append(self, session_id: str, entry: ConversationEntry) -> None:
+        self.append_many(session_id, [entry])
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _insert(conn, session_id: str, entries: List[ConversationEntry]) -> None:
+        conn.executemany(
+            "INSERT INTO conversation_entries "
+            "(session_id, query, summary, timestamp) VALUES (?, ?, ?, ?)",
+            [(session_id, e.query, e.summary, e.timestamp) for e in entries],
+        )
+        conn.execute(
+            "INSERT INTO sessions VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET "
+            "conversation_count = conversation_count + excluded.conversation_count, "
+            "last_query = excluded.last_query, "
+            "last_timestamp = excluded.last_timestamp",
+            (
+                session_id,
+                len(entries),
+                entries[-1].query,
+                entries[-1].timestamp,
+            ),
+        )
+
+    def append_many(self, session_id: str, entries: List[ConversationEntry]) -> None:
+        if not entries:
+            return
+        with self._transaction() as conn:
+            self._insert(conn, session_id, entries)
+
+    def delete(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM conversation_entries WHERE session_id = ?", (session_id,)
+            )
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.execute("COMMIT")
+
+    def list_sessions(self, limit: int = 100, offset: int = 0) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT session_id, conversation_count, last_query, last_timestamp "
+                "FROM sessions ORDER BY last_timestamp DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [
+            {
+                "session_id": session_id,
+                "conversation_count": count,
+                "last_query": last_query,
+                "last_timestamp": last_timestamp,
+            }
+            for session_id, count, last_query, last_timestamp in rows
+        ]
+
+    def count_sessions(self) -> int:
+        with self._connect() as conn:
+            (count,) = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return count
+
+    def _files_imported(self, conn) -> bool:
+        row = conn.execute(
+            "SELECT 1 FROM store_meta WHERE key = 'files_imported'"
+        ).fetchone()
+        return row is not None
+
+    def import_files(self, directory: Path) -> int:
+        """Copy sessions from the JSON file layout into this store, once.
+
+        The import and its marker row commit in one transaction, so when
+        several workers start on a new database only the first one imports.
+        A database that already holds entries (from before the marker) is
+        marked without importing.
+        """
+        with self._connect() as conn:
+            if self._files_imported(conn):
+                return 0
+        files = FileSessionStore(directory)
+        histories = {
+            session_file.stem: files.load(session_file.stem)
+            for session_file in Path(directory).glob("*.json")
+        }
+        histories = {session_id: h for session_id, h in histories.items() if h}
+        with self._transaction() as conn:
+            if self._files_imported(conn):
+                return 0
+            (existing,) = conn.execute(
+                "SELECT COUNT(*) FROM conversation_entries"
+            ).fetchone()
+            if existing:
+                histories = {}
+            for session_id, history in histories.items():
+                self._insert(conn, session_id, history)
+            conn.execute(
+                "INSERT INTO store_meta VALUES ('files_imported', ?)",
+                (str(len(histories)),),
+            )
+        return len(histories)
+
+
+def create_session_store(
+    sessions_dir: Path, backend: Optional[str] = None
+) -> SessionStore:
+    """Build the backend named by ``SESSION_BACKEND`` (``sqlite`` or ``file``)"""
+    backend = (backend or os.getenv("SESSION_BACKEND", "sqlite")).lower()
+    if backend == "file":
+        return FileSessionStore(sessions_dir)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown session backend: {backend}")
+
+    db_path = Path(os.getenv("SESSION_DB_PATH", sessions_dir / "sessions.sqlite3"))
+    store = SQLiteSessionStore(db_path)
+    imported = store.import_files(sessions_dir)
+    if imported:
+        log_event(logger, "sessions_imported", count=imported, path=str(db_path))
+    return store
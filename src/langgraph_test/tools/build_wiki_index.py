@@ -0,0 +1,158 @@
+"""
+Build a local Wikipedia search index for ``WIKI_BACKEND=local``.
+
+Accepts a MediaWiki XML dump (``enwiki-latest-pages-articles.xml.bz2``) or
+JSON lines with ``title`` and ``text`` fields (e.g. wikiextractor output),
+optionally bz2/gzip compressed. Only each article's lead section is kept.
+Memory stays bounded by ``--buffer-mb`` however large the dump: postings are
+spilled to sorted runs on disk and merged at the end.
+
+Run from ``src/langgraph_test``:
+
+    python -m tools.build_wiki_index enwiki-latest-pages-articles.xml.bz2 --out wiki_index
+"""
+
+import argparse
+import bz2
+import gzip
+import json
+import re
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Iterator
+
+from tools.local_wiki import INDEX_BUFFER_BYTES, IndexWriter
+
+SUMMARY_CHARS_MAX = 2000
+
+_REDIRECT_RE = re.compile(r"^#redirect", re.IGNORECASE)
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+_REF_RE = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_FILE_LINK_RE = re.compile(
+    r"\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]",
+    re.IGNORECASE,
+)
+_LINK_RE = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]+)\]\]")
+_EXTERNAL_LINK_RE = re.compile(r"\[https?://[^\s\]]+\s?([^\]]*)\]")
+_EMPHASIS_RE = re.compile(r"'{2,}")
+_TABLE_RE = re.compile(r"\{\|.*?\|\}", re.DOTALL)
+
+
+def _open(path: Path):
+    if path.suffix == ".bz2":
+        return bz2.open(path, "rb")
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _strip_templates(text: str) -> str:
+    """Remove (possibly nested) ``{{...}}`` templates"""
+    out, depth, i = [], 0, 0
+    while i < len(text):
+        pair = text[i : i + 2]
+        if pair == "{{":
+            depth += 1
+            i += 2
+        elif pair == "}}" and depth:
+            depth -= 1
+            i += 2
+        else:
+            if not depth:
+                out.append(text[i])
+            i += 1
+    return "".join(out)
+
+
+def lead_section(wikitext: str) -> str:
+    """Plain text of the article lead (everything before the first heading)"""
+    lead = wikitext.split("\n==", 1)[0]
+    lead = _COMMENT_RE.sub("", lead)
+    lead = _REF_RE.sub("", lead)
+    lead = _strip_templates(lead)
+    lead = _TABLE_RE.sub("", lead)
+    lead = _FILE_LINK_RE.sub("", lead)
+    lead = _LINK_RE.sub(r"\1", lead)
+    lead = _EXTERNAL_LINK_RE.sub(r"\1", lead)
+    lead = _TAG_RE.sub("", lead)
+    lead = _EMPHASIS_RE.sub("", lead)
+    lead = re.sub(r"[ \t]+", " ", lead)
+    lead = re.sub(r"\n{2,}", "\n", lead).strip()
+    return lead[:SUMMARY_CHARS_MAX]
+
+
+def iter_xml_dump(path: Path) -> Iterator[tuple[str, str]]:
+    with _open(path) as f:
+        title, text, namespace = None, None, None
+        for _, element in ET.iterparse(f, events=("end",)):
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag == "title":
+                title = element.text
+            elif tag == "ns":
+                namespace = element.text
+            elif tag == "text":
+                text = element.text or ""
+            elif tag == "page":
+                if namespace == "0" and title and not _REDIRECT_RE.match(text or ""):
+                    yield title, lead_section(text)
+                title, text, namespace = None, None, None
+                element.clear()
+
+
+def iter_jsonl(path: Path) -> Iterator[tuple[str, str]]:
+    with _open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            text = record.get("text", "")
+            yield record["title"], text.split("\n\n", 1)[0][:SUMMARY_CHARS_MAX]
+
+
+def iter_articles(path: Path) -> Iterator[tuple[str, str]]:
+    name = path.name.removesuffix(".bz2").removesuffix(".gz")
+    if name.endswith(".jsonl") or name.endswith(".json"):
+        return iter_jsonl(path)
+    return iter_xml_dump(path)
+
+
+def build_index(
+    source: Path, out: Path, limit: int = 0, buffer_bytes: int = INDEX_BUFFER_BYTES
+) -> int:
+    writer = IndexWriter(out, buffer_bytes=buffer_bytes)
+    started = time.perf_counter()
+    for count, (title, summary) in enumerate(iter_articles(source), 1):
+        if summary:
+            writer.add(title, summary)
+        if count % 100_000 == 0:
+            print(f"  {count} articles read ({time.perf_counter() - started:.0f}s)")
+        if limit and count >= limit:
+            break
+    return writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("source", type=Path, help="XML dump or JSON lines file")
+    parser.add_argument("--out", type=Path, default=Path("wiki_index"))
+    parser.add_argument(
+        "--limit", type=int, default=0, help="stop after N articles (0 = all)"
+    )
+    parser.add_argument(
+        "--buffer-mb",
+        type=int,
+        default=INDEX_BUFFER_BYTES // 2**20,
+        help="postings buffered in memory before spilling a sorted run to disk",
+    )
+    args = parser.parse_args()
+
+    documents = build_index(
+        args.source, args.out, args.limit, args.buffer_mb * 2**20
+    )
+    print(f"Indexed {documents} articles into {args.out}")
+
+
+if __name__ == "__main__":
+    main()
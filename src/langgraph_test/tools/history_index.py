@@ -0,0 +1,177 @@
+"""
+Per-session BM25 index over conversation turns.
+
+Nodes ask for the turns most relevant to the current task instead of the last
+few, so long sessions keep prompts flat and still surface old answers. The
+index only stores term statistics; turn text stays in the run's config (see
+``run_history``) and is looked up by position.
+"""
+
+import math
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Callable, Optional
+
+from langgraph.config import get_config
+from nodes.state_agent import ConversationEntry
+
+from tools.local_wiki import tokenize
+from tools.prompt_budget import count_tokens
+
+# Turns retrieved per node (override with HISTORY_TOP_K_<NODE>)
+HISTORY_TOP_K = {
+    "planner": int(os.getenv("HISTORY_TOP_K_PLANNER", 3)),
+    "summarizer": int(os.getenv("HISTORY_TOP_K_SUMMARIZER", 2)),
+    "history": int(os.getenv("HISTORY_TOP_K_HISTORY", 5)),
+}
+# Sessions whose index is kept in memory; evicted ones are rebuilt on demand
+HISTORY_INDEX_SESSIONS = int(os.getenv("HISTORY_INDEX_SESSIONS", 1024))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _entry_tokens(entry: ConversationEntry) -> list[str]:
+    # The query names the topic of a turn, so it counts twice
+    return tokenize(entry.query) * 2 + tokenize(entry.summary)
+
+
+class HistoryIndex:
+    """BM25 over one session's turns, appended to as the session grows"""
+
+    def __init__(self):
+        self._postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self._doclens: list[int] = []
+        self._total_length = 0
+        self._queries: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doclens)
+
+    def add(self, entry: ConversationEntry) -> None:
+        tokens = _entry_tokens(entry)
+        frequencies: dict[str, int] = defaultdict(int)
+        for token in tokens:
+            frequencies[token] += 1
+        with self._lock:
+            position = len(self._doclens)
+            for token, tf in frequencies.items():
+                self._postings[token].append((position, tf))
+            self._doclens.append(len(tokens))
+            self._total_length += len(tokens)
+            self._queries[_normalize(entry.query)] = position
+
+    def find_query(self, query: str) -> Optional[int]:
+        """Position of the latest turn whose query equals ``query``"""
+        return self._queries.get(_normalize(query))
+
+    def scores(self, query: str) -> dict[int, float]:
+        with self._lock:
+            count = len(self._doclens)
+            average = self._total_length / count if count else 1.0
+            scores: dict[int, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                for position, tf in postings:
+                    length_ratio = self._doclens[position] / (average or 1.0)
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length_ratio)
+                    scores[position] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+
+class HistoryIndexRegistry:
+    """LRU of per-session indexes, kept in step with the stored history"""
+
+    def __init__(self, max_sessions: int = HISTORY_INDEX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._indexes: OrderedDict[str, HistoryIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, session_id: Optional[str], history: list[ConversationEntry]
+    ) -> HistoryIndex:
+        """Index covering ``history``; missing turns are indexed incrementally"""
+        with self._lock:
+            index = self._indexes.get(session_id) if session_id else None
+            if index is not None and len(index) > len(history):
+                # A run that loaded the history before a concurrent append
+                index = HistoryIndex()
+            elif session_id:
+                if index is None:
+                    index = self._indexes[session_id] = HistoryIndex()
+                self._indexes.move_to_end(session_id)
+                while len(self._indexes) > self.max_sessions:
+                    self._indexes.popitem(last=False)
+            else:
+                index = HistoryIndex()
+            # History is append-only, so only turns past the indexed count are new
+            for entry in history[len(index) :]:
+                index.add(entry)
+        return index
+
+    def append(self, session_id: str, history: list[ConversationEntry]) -> None:
+        """Index the turns just appended to ``history``"""
+        self.get(session_id, history)
+
+    def drop(self, session_id: str) -> None:
+        with self._lock:
+            self._indexes.pop(session_id, None)
+
+
+history_indexes = HistoryIndexRegistry()
+
+
+def run_history() -> list[ConversationEntry]:
+    """Prior turns of the running graph's session.
+
+    ``checkpointing.run_config`` passes them in the config so they are never
+    written to checkpoints; outside a graph run there are none.
+    """
+    try:
+        config = get_config()
+    except RuntimeError:
+        return []
+    return config.get("configurable", {}).get("conversation_history", [])
+
+
+def relevant_turns(
+    session_id: Optional[str],
+    history: list[ConversationEntry],
+    query: str,
+    top_k: int,
+    budget: int,
+    render: Callable[[ConversationEntry], str],
+) -> list[str]:
+    """Render the ``top_k`` turns most relevant to ``query`` within ``budget`` tokens.
+
+    The latest turn always takes one slot, since follow-ups often refer to it
+    without sharing any words. Turns are returned in chronological order.
+    """
+    if not history or top_k <= 0:
+        return []
+    index = history_indexes.get(session_id, history)
+    scores = index.scores(query)
+    latest = len(history) - 1
+    ranked = sorted(
+        (position for position in scores if position != latest),
+        key=lambda position: (scores[position], position),
+        reverse=True,
+    )
+    chosen, used = {}, 0
+    for position in [latest] + ranked[: top_k - 1]:
+        text = render(history[position])
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            continue
+        chosen[position] = text
+        used += tokens
+    return [chosen[position] for position in sorted(chosen)]
@@ -0,0 +1,68 @@
+"""
+Per-event-loop ``httpx.AsyncClient`` pools.
+
+Pooled async connections belong to the event loop that opened them. Code that
+calls ``asyncio.run`` more than once (``batch.batch``, the benchmarks) gets a
+new loop each time, so one shared ``AsyncClient`` would hand it connections of
+a closed loop. ``LoopClients`` keeps one client per loop. A loop's clients
+cannot be closed once the loop is closed, so whoever owns a loop calls
+``aclose_loop_clients()`` before it ends; clients of loops that ended without
+doing so are dropped when a new loop asks for one.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Callable
+
+import httpx
+
+# Every LoopClients instance, for aclose_loop_clients
+_pools: "weakref.WeakSet[LoopClients]" = weakref.WeakSet()
+
+
+class LoopClients:
+    """One ``httpx.AsyncClient`` per running event loop, built by ``factory``"""
+
+    def __init__(self, factory: Callable[[], httpx.AsyncClient]):
+        self.factory = factory
+        self._clients: dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+        _pools.add(self)
+
+    def get(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                for stale in [other for other in self._clients if other.is_closed()]:
+                    del self._clients[stale]
+                client = self._clients[loop] = self.factory()
+            return client
+
+    async def aclose(self) -> None:
+        """Close the running loop's client, if it has one"""
+        with self._lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+class LoopAsyncClient(httpx.AsyncClient):
+    """An ``AsyncClient`` for SDKs that take one client at construction.
+
+    Requests are built here but sent through the running loop's client of
+    ``pools``; this client's own pool is never used.
+    """
+
+    def __init__(self, pools: LoopClients, **options):
+        super().__init__(**options)
+        self._pools = pools
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self._pools.get().send(request, **kwargs)
+
+
+async def aclose_loop_clients() -> None:
+    """Close every pool's client for the running loop; call before it ends"""
+    await asyncio.gather(*(pools.aclose() for pools in list(_pools)))
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import time
+from typing import Optional
+
+from observability import (
+    LLM_CACHE_HITS,
+    LLM_COMPLETION_TOKENS,
+    LLM_DURATION,
+    span,
+)
+from tools.llm_clients import (
+    acall_with_retries,
+    call_with_retries,
+    charge_llm_call,
+    llm_registry,
+    rate_limiter,
+)
+from tools.prompt_budget import count_tokens, record_prompt_tokens
+from tools.ttl_cache import TTLCache
+
+# Opt-in: LLM_CACHE_NODES lists the nodes whose responses may be reused
+LLM_CACHE_NODES = {
+    node.strip()
+    for node in os.getenv("LLM_CACHE_NODES", "").split(",")
+    if node.strip()
+}
+
+
+def prompt_cache_key(llm, prompt: str) -> str:
+    """Hash model, temperature and the whitespace-normalized prompt"""
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", "")
+    temperature = getattr(llm, "temperature", None)
+    normalized = " ".join(prompt.split())
+    digest = hashlib.sha256(f"{model}|{temperature}|{normalized}".encode())
+    return digest.hexdigest()
+
+
+class LLMCache(TTLCache):
+    """Response cache for the node LLM calls, enabled per node"""
+
+    def __init__(self, enabled_nodes: set[str], path: Optional[str] = None, **kwargs):
+        super().__init__("llm_cache", path=path, **kwargs)
+        self.enabled_nodes = enabled_nodes
+
+    def enabled(self, node: str) -> bool:
+        return "all" in self.enabled_nodes or node in self.enabled_nodes
+
+    def stats(self) -> dict:
+        return {"enabled_nodes": sorted(self.enabled_nodes), **super().stats()}
+
+
+llm_cache = LLMCache(
+    LLM_CACHE_NODES,
+    path=os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3") or None,
+    ttl=float(os.getenv("LLM_CACHE_TTL", 24 * 3600)),
+    max_memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", 512)),
+    max_disk_entries=int(os.getenv("LLM_CACHE_DISK_ENTRIES", 20_000)),
+)
+
+
+def _call_llm(node: str, llm, prompt: str) -> str:
+    prompt_tokens = record_prompt_tokens(node, prompt)
+    with span("rate_limit", node):
+        rate_limiter.wait(node, prompt_tokens)
+    start = time.perf_counter()
+    with span("llm", node) as fields:
+        content = call_with_retries(
+            node, lambda: llm.invoke(prompt), prompt_tokens
+        ).content
+        completion_tokens = count_tokens(content)
+        fields.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    LLM_DURATION.observe(time.perf_counter() - start, node=node)
+    LLM_COMPLETION_TOKENS.inc(completion_tokens, node=node)
+    charge_llm_call(prompt_tokens + completion_tokens)
+    return content
+
+
+async def _acall_llm(node: str, llm, prompt: str) -> str:
+    prompt_tokens = record_prompt_tokens(node, prompt)
+    with span("rate_limit", node):
+        await rate_limiter.await_slot(node, prompt_tokens)
+    start = time.perf_counter()
+    with span("llm", node) as fields:
+        content = (
+            await acall_with_retries(node, lambda: llm.ainvoke(prompt), prompt_tokens)
+        ).content
+        completion_tokens = count_tokens(content)
+        fields.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    LLM_DURATION.observe(time.perf_counter() - start, node=node)
+    LLM_COMPLETION_TOKENS.inc(completion_tokens, node=node)
+    charge_llm_call(prompt_tokens + completion_tokens)
+    return content
+
+
+def _model_and_key(node: str, prompt: str, schema) -> tuple:
+    llm = llm_registry.get(node)
+    if schema is None:
+        return llm, prompt
+    return llm_registry.structured(node, schema), f"{schema.__name__}|{prompt}"
+
+
+def invoke_llm(node: str, prompt: str, schema=None) -> str:
+    """Call the node's model with ``prompt``, served from cache when enabled.
+
+    With a Pydantic ``schema`` the reply is that model serialized as JSON.
+    """
+    llm, cache_prompt = _model_and_key(node, prompt, schema)
+    if not llm_cache.enabled(node):
+        return _call_llm(node, llm, prompt)
+    key = prompt_cache_key(llm_registry.get(node), cache_prompt)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        LLM_CACHE_HITS.inc(node=node)
+        return cached
+    content = _call_llm(node, llm, prompt)
+    llm_cache.set(key, content)
+    return content
+
+
+async def ainvoke_llm(node: str, prompt: str, schema=None) -> str:
+    """Async variant of ``invoke_llm``"""
+    llm, cache_prompt = _model_and_key(node, prompt, schema)
+    if not llm_cache.enabled(node):
+        return await _acall_llm(node, llm, prompt)
+    key = prompt_cache_key(llm_registry.get(node), cache_prompt)
+    # The SQLite tier runs in a worker thread, off the event loop
+    cached = await llm_cache.aget(key)
+    if cached is not None:
+        LLM_CACHE_HITS.inc(node=node)
+        return cached
+    content = await _acall_llm(node, llm, prompt)
+    await llm_cache.aset(key, content)
+    return content
@@ -0,0 +1,288 @@
+"""
+Shared LLM clients for the graph nodes.
+
+Models are built on first use, so importing the app needs no API key. All
+nodes share one pooled HTTP transport (one async pool per event loop), one requests/tokens-per-minute limiter
+that queues callers instead of failing, and one retry policy for 429 and 5xx
+responses.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from observability import LLM_RATE_LIMIT_WAIT, LLM_RETRIES, log_event, span
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4.1-mini-2025-04-14")
+NODE_TEMPERATURES = {
+    "planner": 0.4,
+    "summarizer": 0,
+    "examiner": 0.2,
+    "history": 0.2,
+}
+
+# Global limits shared by every node (0 disables a limit)
+LLM_RPM = int(os.getenv("LLM_RPM", 500))
+LLM_TPM = int(os.getenv("LLM_TPM", 200_000))
+# Completion tokens reserved per call, on top of the counted prompt tokens
+LLM_EXPECTED_COMPLETION_TOKENS = int(
+    os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", 300)
+)
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 20))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 50))
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units per minute; callers reserve and then wait.
+
+    Reservations may drive the level negative, which queues later callers
+    behind earlier ones in arrival order.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` and return the seconds to wait before using it"""
+        if self.capacity <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.level = min(
+                self.capacity, self.level + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.level -= min(amount, self.capacity)
+            return max(0.0, -self.level / self.rate)
+
+
+class RateLimiter:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def reserve(self, prompt_tokens: int) -> float:
+        return max(
+            self.requests.reserve(1),
+            self.tokens.reserve(prompt_tokens + LLM_EXPECTED_COMPLETION_TOKENS),
+        )
+
+    def wait(self, node: str, prompt_tokens: int) -> None:
+        delay = self.reserve(prompt_tokens)
+        LLM_RATE_LIMIT_WAIT.observe(delay, node=node)
+        if delay:
+            time.sleep(delay)
+
+    async def await_slot(self, node: str, prompt_tokens: int) -> None:
+        delay = self.reserve(prompt_tokens)
+        LLM_RATE_LIMIT_WAIT.observe(delay, node=node)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+rate_limiter = RateLimiter(LLM_RPM, LLM_TPM)
+
+# RunBudget of the graph node currently running (set by budget.enforce_budget)
+budget_var: ContextVar = ContextVar("run_budget", default=None)
+
+
+def charge_llm_call(tokens: int) -> None:
+    """Count one LLM call and its tokens against the running node's budget"""
+    budget = budget_var.get()
+    if budget is not None:
+        budget.llm_calls += 1
+        budget.tokens += tokens
+
+
+def _retry_reason(error: Exception) -> Optional[str]:
+    """Why ``error`` is worth retrying, or None when it is not"""
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return "connection"
+    status = getattr(error, "status_code", None)
+    if status == 429:
+        return "rate_limited"
+    if status is not None and status >= 500:
+        return "server_error"
+    return None
+
+
+def _backoff(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, honouring a Retry-After header"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2**attempt))
+
+
+def _retry_delay(node: str, attempt: int, error: Exception) -> float:
+    """Seconds to back off before retrying ``error``; re-raises it otherwise"""
+    reason = _retry_reason(error)
+    if reason is None or attempt == LLM_MAX_RETRIES:
+        raise error
+    delay = _backoff(attempt, error)
+    LLM_RETRIES.inc(node=node, reason=reason)
+    log_event(
+        logger,
+        "llm_retry",
+        level=logging.WARNING,
+        node=node,
+        reason=reason,
+        attempt=attempt + 1,
+        delay=round(delay, 2),
+    )
+    return delay
+
+
+def call_with_retries(node: str, call: Callable, prompt_tokens: int = 0):
+    """Run ``call`` (whose slot the caller reserved), retrying transient errors.
+
+    Every retry reserves a new rate-limiter slot, so retries after a 429 stay
+    within the shared RPM/TPM limits.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if attempt:
+            with span("rate_limit", node):
+                rate_limiter.wait(node, prompt_tokens)
+        try:
+            return call()
+        except Exception as e:
+            time.sleep(_retry_delay(node, attempt, e))
+
+
+async def acall_with_retries(node: str, call: Callable, prompt_tokens: int = 0):
+    """Async variant of ``call_with_retries``"""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if attempt:
+            with span("rate_limit", node):
+                await rate_limiter.await_slot(node, prompt_tokens)
+        try:
+            return await call()
+        except Exception as e:
+            await asyncio.sleep(_retry_delay(node, attempt, e))
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+class LLMRegistry:
+    """Builds one chat model per node on first use, over shared HTTP pools"""
+
+    def __init__(self, temperatures: dict[str, float], model: str = LLM_MODEL):
+        self.temperatures = temperatures
+        self.model = model
+        self._models = {}
+        self._structured = {}
+        self._http_clients = None
+        self._lock = threading.Lock()
+
+    def _clients(self):
+        import httpx
+
+        from tools.http_pools import LoopAsyncClient, LoopClients
+
+        if self._http_clients is None:
+            options = {
+                "limits": httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                ),
+                "timeout": LLM_TIMEOUT,
+            }
+            # Async connections belong to their loop; the models send through
+            # the pool of whichever loop calls them
+            async_pools = LoopClients(lambda: httpx.AsyncClient(**options))
+            self._http_clients = (
+                httpx.Client(**options),
+                LoopAsyncClient(async_pools, **options),
+            )
+        return self._http_clients
+
+    def get(self, node: str):
+        model = self._models.get(node)
+        if model is not None:
+            return model
+        with self._lock:
+            if node not in self._models:
+                from langchain_openai import ChatOpenAI
+
+                http_client, http_async_client = self._clients()
+                self._models[node] = ChatOpenAI(
+                    model=self.model,
+                    temperature=self.temperatures[node],
+                    # Retries are handled here so they respect the shared limiter
+                    max_retries=0,
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                )
+            return self._models[node]
+
+    def structured(self, node: str, schema):
+        """The node's model answering with ``schema`` serialized as JSON content.
+
+        Models without structured output support are returned as they are, and
+        are expected to reply with the JSON themselves. Replies that fail to
+        parse are returned as raw text rather than raised.
+        """
+        key = (node, schema)
+        runnable = self._structured.get(key)
+        if runnable is not None:
+            return runnable
+        from langchain_core.messages import AIMessage
+        from langchain_core.runnables import RunnableLambda
+
+        def to_message(result) -> AIMessage:
+            if result["parsed"] is not None:
+                return AIMessage(content=result["parsed"].model_dump_json())
+            # A malformed or refused reply goes back as its raw text, which
+            # callers parse like the reply of a model without structured output
+            log_event(
+                logger,
+                "structured_output_unparsed",
+                node=node,
+                error=repr(result["parsing_error"]),
+            )
+            content = result["raw"].content
+            return AIMessage(content=content if isinstance(content, str) else "")
+
+        model = self.get(node)
+        try:
+            runnable = model.with_structured_output(
+                schema, include_raw=True
+            ) | RunnableLambda(to_message)
+        except NotImplementedError:
+            runnable = model
+        with self._lock:
+            self._structured[key] = runnable
+        return runnable
+
+    def set(self, node: str, model) -> None:
+        """Use ``model`` for ``node`` (offline benchmarks and local testing)"""
+        with self._lock:
+            self._models[node] = model
+            for key in [key for key in self._structured if key[0] == node]:
+                del self._structured[key]
+
+
+llm_registry = LLMRegistry(NODE_TEMPERATURES)
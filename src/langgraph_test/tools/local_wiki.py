@@ -0,0 +1,355 @@
+"""
+Offline Wikipedia search over an on-disk index built by ``tools.build_wiki_index``.
+
+Index directory layout:
+
+- ``meta.json``      version, document count, average length, BM25 parameters
+- ``terms.bin``      every term, UTF-8, concatenated in sorted order
+- ``lexicon.bin``    per term (term offset uint64, term bytes uint32,
+                     postings offset uint64, postings bytes uint32, df uint32)
+- ``postings.bin``   per term, varint (doc id, term frequency) pairs, highest
+                     BM25 impact first
+- ``doclens.bin``    uint32 token count per document
+- ``docs.idx``       (offset uint64, length uint32) per document into docs.bin
+- ``docs.bin``       zlib-compressed JSON ``[title, summary]`` records
+
+Every file is memory-mapped, so opening an index loads nothing and a query
+binary-searches the lexicon and touches just the postings it needs. Postings
+are impact-ordered, so a query reads at most ``LOCAL_WIKI_MAX_POSTINGS`` per
+term: common terms lose only their weakest matches instead of costing seconds.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import zlib
+from array import array
+from collections import defaultdict
+from operator import itemgetter
+from pathlib import Path
+from typing import Iterator, Optional
+
+from tools.wiki_cache import is_negative_result
+
+NO_RESULT = "No good Wikipedia Search Result was found"
+DOC_CONTENT_CHARS_MAX = 4000
+TITLE_WEIGHT = 3
+INDEX_VERSION = 2
+# Postings scored per query term (0 reads them all)
+LOCAL_WIKI_MAX_POSTINGS = int(os.getenv("LOCAL_WIKI_MAX_POSTINGS", 20_000))
+# Encoded postings the writer buffers before spilling a sorted run to disk
+INDEX_BUFFER_BYTES = 256 * 2**20
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has he in is it its of on or that the "
+    "to was were will with what which who whom how when where why".split()
+)
+_TOKEN_RE = re.compile(r"\w+")
+_DOC_ENTRY = struct.Struct("<QI")
+_LEXICON_ENTRY = struct.Struct("<QIQII")
+# Per term in a run file: term bytes, postings bytes
+_RUN_HEADER = struct.Struct("<II")
+# Rough memory of one buffered term besides its postings (key, bytearray, dicts)
+_TERM_OVERHEAD = 200
+
+
+def tokenize(text: str) -> list[str]:
+    return [
+        token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS
+    ]
+
+
+def _encode_varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_pairs(data) -> Iterator[tuple[int, int]]:
+    """Yield the varint pairs of a postings slice"""
+    first, value, shift, expecting_second = 0, 0, 0, False
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        if expecting_second:
+            yield first, value
+        else:
+            first = value
+        expecting_second = not expecting_second
+        value, shift = 0, 0
+
+
+def _iter_run(path: Path) -> Iterator[tuple[str, bytes]]:
+    with open(path, "rb") as f:
+        while header := f.read(_RUN_HEADER.size):
+            term_size, size = _RUN_HEADER.unpack(header)
+            yield f.read(term_size).decode(), f.read(size)
+
+
+class IndexWriter:
+    """Writes the index files in bounded memory.
+
+    Postings are delta-varint encoded into per-term buffers as articles are
+    added. Once the buffers hold ``buffer_bytes`` they are spilled to a sorted
+    run file; ``close`` merges the runs term by term, orders each term's
+    postings by BM25 impact and writes the final files.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        buffer_bytes: int = INDEX_BUFFER_BYTES,
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.buffer_bytes = buffer_bytes
+        self.k1 = k1
+        self.b = b
+        self._buffers: dict[str, bytearray] = {}
+        self._last_doc: dict[str, int] = {}
+        self._buffered = 0
+        self._runs: list[Path] = []
+        self._doclens = array("I")
+        self._docs_file = open(self.directory / "docs.bin", "wb")
+        self._docs_index = open(self.directory / "docs.idx", "wb")
+        self._offset = 0
+
+    def add(self, title: str, summary: str) -> None:
+        doc_id = len(self._doclens)
+        tokens = tokenize(summary) + tokenize(title) * TITLE_WEIGHT
+        frequencies: dict[str, int] = defaultdict(int)
+        for token in tokens:
+            frequencies[token] += 1
+        for token, tf in frequencies.items():
+            buffer = self._buffers.get(token)
+            if buffer is None:
+                buffer = self._buffers[token] = bytearray()
+                self._buffered += _TERM_OVERHEAD
+            size = len(buffer)
+            _encode_varint(doc_id - self._last_doc.get(token, 0), buffer)
+            _encode_varint(tf, buffer)
+            self._last_doc[token] = doc_id
+            self._buffered += len(buffer) - size
+        self._doclens.append(len(tokens))
+
+        record = zlib.compress(json.dumps([title, summary]).encode())
+        self._docs_file.write(record)
+        self._docs_index.write(_DOC_ENTRY.pack(self._offset, len(record)))
+        self._offset += len(record)
+        if self._buffered >= self.buffer_bytes:
+            self._spill()
+
+    def _spill(self) -> None:
+        """Write the buffered postings as a sorted run and start a new one"""
+        path = self.directory / f"run-{len(self._runs):04d}.tmp"
+        with open(path, "wb") as f:
+            for term in sorted(self._buffers):
+                encoded = term.encode()
+                postings = self._buffers[term]
+                f.write(_RUN_HEADER.pack(len(encoded), len(postings)))
+                f.write(encoded)
+                f.write(postings)
+        self._runs.append(path)
+        # Each run's doc id deltas start from zero again
+        self._buffers, self._last_doc, self._buffered = {}, {}, 0
+
+    def _impact_ordered(self, runs: list[bytes], average: float) -> tuple[bytes, int]:
+        """One term's postings from its runs, re-encoded highest impact first"""
+        doc_ids, frequencies, impacts = array("I"), array("I"), array("d")
+        for data in runs:
+            doc_id = 0
+            for delta, tf in _decode_pairs(data):
+                doc_id += delta
+                length_ratio = self._doclens[doc_id] / average
+                norm = self.k1 * (1 - self.b + self.b * length_ratio)
+                doc_ids.append(doc_id)
+                frequencies.append(tf)
+                impacts.append(tf * (self.k1 + 1) / (tf + norm))
+        # Stable, so equal impacts stay in doc id order
+        order = sorted(range(len(doc_ids)), key=impacts.__getitem__, reverse=True)
+        encoded = bytearray()
+        for i in order:
+            _encode_varint(doc_ids[i], encoded)
+            _encode_varint(frequencies[i], encoded)
+        return bytes(encoded), len(order)
+
+    def close(self) -> int:
+        self._docs_file.close()
+        self._docs_index.close()
+        with open(self.directory / "doclens.bin", "wb") as f:
+            self._doclens.tofile(f)
+        self._spill()
+
+        count = len(self._doclens)
+        average = (sum(self._doclens) / count if count else 0.0) or 1.0
+        runs = [_iter_run(path) for path in self._runs]
+        with open(self.directory / "postings.bin", "wb") as postings, open(
+            self.directory / "terms.bin", "wb"
+        ) as terms, open(self.directory / "lexicon.bin", "wb") as lexicon:
+            postings_offset = terms_offset = 0
+            # Runs hold consecutive documents, and merge keeps equal terms in
+            # run order
+            merged = heapq.merge(*runs, key=itemgetter(0))
+            for term, group in itertools.groupby(merged, key=itemgetter(0)):
+                encoded, df = self._impact_ordered(
+                    [data for _, data in group], average
+                )
+                term_bytes = term.encode()
+                postings.write(encoded)
+                terms.write(term_bytes)
+                lexicon.write(
+                    _LEXICON_ENTRY.pack(
+                        terms_offset,
+                        len(term_bytes),
+                        postings_offset,
+                        len(encoded),
+                        df,
+                    )
+                )
+                postings_offset += len(encoded)
+                terms_offset += len(term_bytes)
+        for path in self._runs:
+            path.unlink()
+
+        meta = {
+            "version": INDEX_VERSION,
+            "documents": count,
+            "average_length": sum(self._doclens) / count if count else 0.0,
+            "k1": self.k1,
+            "b": self.b,
+        }
+        with open(self.directory / "meta.json", "w") as f:
+            json.dump(meta, f, indent=2)
+        return count
+
+
+class LocalWikiIndex:
+    """BM25 search over a local index, returning WikipediaQueryRun-style text"""
+
+    def __init__(
+        self,
+        directory: Path,
+        top_k: int = 3,
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+        max_postings: int = LOCAL_WIKI_MAX_POSTINGS,
+    ):
+        self.directory = Path(directory)
+        self.top_k = top_k
+        self.k1 = k1
+        self.b = b
+        self.max_postings = max_postings or None
+        with open(self.directory / "meta.json") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(
+                f"{self.directory} holds a version {meta.get('version')} index; "
+                "rebuild it with tools.build_wiki_index"
+            )
+        self.documents = meta["documents"]
+        self.average_length = meta["average_length"] or 1.0
+        self._terms = self._map("terms.bin")
+        self._lexicon = self._map("lexicon.bin")
+        self._postings = memoryview(self._map("postings.bin"))
+        self._docs = self._map("docs.bin")
+        self._docs_index = self._map("docs.idx")
+        self._doclens = memoryview(self._map("doclens.bin")).cast("I")
+        self.terms = len(self._lexicon) // _LEXICON_ENTRY.size
+
+    def _map(self, name: str):
+        with open(self.directory / name, "rb") as f:
+            if f.seek(0, 2) == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _lookup(self, term: str) -> Optional[tuple[int, int, int]]:
+        """``(postings offset, postings bytes, df)`` of ``term``, by binary search"""
+        key = term.encode()
+        low, high = 0, self.terms
+        while low < high:
+            middle = (low + high) // 2
+            term_offset, term_size, offset, size, df = _LEXICON_ENTRY.unpack_from(
+                self._lexicon, middle * _LEXICON_ENTRY.size
+            )
+            candidate = self._terms[term_offset : term_offset + term_size]
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return offset, size, df
+        return None
+
+    def search(self, query: str, top_k: int = None) -> list[tuple[str, str]]:
+        """Return ``[(title, summary)]`` for the best BM25 matches"""
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            entry = self._lookup(term)
+            if entry is None:
+                continue
+            offset, size, df = entry
+            idf = math.log(1 + (self.documents - df + 0.5) / (df + 0.5))
+            postings = _decode_pairs(self._postings[offset : offset + size])
+            for doc_id, tf in itertools.islice(postings, self.max_postings):
+                length_ratio = self._doclens[doc_id] / self.average_length
+                norm = self.k1 * (1 - self.b + self.b * length_ratio)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(
+            top_k or self.top_k, scores.items(), key=lambda item: item[1]
+        )
+        return [self._document(doc_id) for doc_id, _ in best]
+
+    def _document(self, doc_id: int) -> tuple[str, str]:
+        start = doc_id * _DOC_ENTRY.size
+        entry = self._docs_index[start : start + _DOC_ENTRY.size]
+        offset, size = _DOC_ENTRY.unpack(entry)
+        title, summary = json.loads(zlib.decompress(self._docs[offset : offset + size]))
+        return title, summary
+
+    def invoke(self, query: str) -> str:
+        pages = self.search(query)
+        if not pages:
+            return NO_RESULT
+        text = "\n\n".join(
+            f"Page: {title}\nSummary: {summary}" for title, summary in pages
+        )
+        return text[:DOC_CONTENT_CHARS_MAX]
+
+    async def ainvoke(self, query: str) -> str:
+        # Scoring up to max_postings per term in pure Python takes a few
+        # milliseconds; off the event loop so concurrent requests keep running
+        return await asyncio.to_thread(self.invoke, query)
+
+
+class FallbackWiki:
+    """Answer from ``primary`` and fall back to ``fallback`` on a miss"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+
+    def invoke(self, query: str) -> str:
+        result = self.primary.invoke(query)
+        if is_negative_result(result):
+            return self.fallback.invoke(query)
+        return result
+
+    async def ainvoke(self, query: str) -> str:
+        result = await self.primary.ainvoke(query)
+        if is_negative_result(result):
+            return await self.fallback.ainvoke(query)
+        return result
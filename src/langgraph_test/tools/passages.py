@@ -0,0 +1,123 @@
+"""
+Passage extraction for Wikipedia results.
+
+A ``wiki_search`` result holds up to three page summaries. Before a result
+enters the agent memory it is split into passages of a few sentences, scored
+with BM25 against the task and search term, and cut down to the best passages
+that fit ``RESEARCH_PASSAGE_TOKENS``. Each kept passage carries its page title.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+
+from tools.local_wiki import tokenize
+from tools.prompt_budget import count_tokens, truncate_tokens
+from tools.wiki_cache import is_negative_result
+
+# Passages kept per result (0 keeps results whole)
+RESEARCH_PASSAGES = int(os.getenv("RESEARCH_PASSAGES", 3))
+# Token budget for the passages kept from one result
+RESEARCH_PASSAGE_TOKENS = int(os.getenv("RESEARCH_PASSAGE_TOKENS", 350))
+PASSAGE_CHARS = 500
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_PAGE_RE = re.compile(r"^Page: (.*)$", re.MULTILINE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_pages(result: str) -> list[tuple[str, str]]:
+    """``[(title, text)]`` from WikipediaQueryRun-style ``Page:/Summary:`` text"""
+    matches = list(_PAGE_RE.finditer(result))
+    if not matches:
+        return [("", result.strip())]
+    pages = []
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(result)
+        text = result[match.end() : end].strip().removeprefix("Summary:")
+        pages.append((match.group(1).strip(), text.strip()))
+    return pages
+
+
+def split_passages(text: str, max_chars: int = PASSAGE_CHARS) -> list[str]:
+    """Group whole sentences into passages of at most ``max_chars``"""
+    passages = []
+    for paragraph in text.split("\n"):
+        current = ""
+        for sentence in _SENTENCE_RE.split(paragraph.strip()):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+        if current:
+            passages.append(current)
+    return passages
+
+
+def _bm25(documents: list[list[str]], query: Counter) -> list[float]:
+    count = len(documents)
+    average = sum(len(doc) for doc in documents) / count or 1.0
+    df = Counter(term for doc in documents for term in set(doc))
+    scores = []
+    for doc in documents:
+        frequencies = Counter(doc)
+        score = 0.0
+        for term, weight in query.items():
+            tf = frequencies.get(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (count - df[term] + 0.5) / (df[term] + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / average)
+            score += weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def extract_passages(
+    result: str,
+    task: str,
+    search_term: str,
+    max_passages: int = RESEARCH_PASSAGES,
+    budget: int = RESEARCH_PASSAGE_TOKENS,
+) -> str:
+    """Keep the passages of ``result`` most relevant to the task and search term"""
+    if max_passages <= 0 or is_negative_result(result):
+        return result
+
+    candidates = [
+        (title, passage)
+        for title, text in split_pages(result)
+        for passage in split_passages(text)
+    ]
+    if not candidates:
+        return result
+
+    # The search term is what the planner is missing, so it weighs double
+    query = Counter(tokenize(task)) + Counter(tokenize(search_term) * 2)
+    documents = [tokenize(f"{title} {passage}") for title, passage in candidates]
+    scores = _bm25(documents, query)
+    ranked = sorted(range(len(candidates)), key=lambda i: (-scores[i], i))
+
+    kept, used = {}, 0
+    for i in ranked[:max_passages]:
+        passage = candidates[i][1]
+        tokens = count_tokens(passage)
+        if used + tokens > budget:
+            if kept:
+                continue
+            passage = truncate_tokens(passage, budget)
+        kept[i] = passage
+        used += tokens
+
+    # Original order reads better, and passages of one page share its header
+    blocks, last_title = [], None
+    for i in sorted(kept):
+        title = candidates[i][0]
+        if title != last_title:
+            blocks.append(f"Page: {title}\n{kept[i]}" if title else kept[i])
+            last_title = title
+        else:
+            blocks[-1] += f"\n{kept[i]}"
+    return "\n\n".join(blocks)
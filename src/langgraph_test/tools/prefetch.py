@@ -0,0 +1,142 @@
+"""
+Speculative Wikipedia prefetch for the first research step.
+
+On the first iteration the planner nearly always asks for a term close to the
+raw query, but the researcher cannot start until the planner's LLM call is
+done. With ``PREFETCH_WIKI=1``, ``/query`` searches the key terms of the query
+in the background while the planner runs. If one of the planner's terms has
+the same key terms, the researcher uses the prefetched result; otherwise the
+prefetch is cancelled. A prefetch that failed is dropped and the term searched
+as usual.
+"""
+
+import asyncio
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from observability import WIKI_PREFETCH, log_event
+
+from tools.local_wiki import tokenize
+from tools.wiki_cache import normalize_query
+from tools.wiki_tool import awiki_search, awiki_search_many
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_WIKI = os.getenv("PREFETCH_WIKI", "0") == "1"
+# Queries with more key terms than this are left to the planner
+PREFETCH_MAX_TERMS = int(os.getenv("PREFETCH_MAX_TERMS", 4))
+
+# Request phrasing that never makes it into a planner search term
+FILLER_WORDS = frozenset(
+    "tell me about explain describe please can could would you i do does did "
+    "give some info information".split()
+)
+
+
+def key_terms(text: str) -> list[str]:
+    """Content words of ``text`` in order, without stopwords and filler"""
+    return [
+        token
+        for token in tokenize(normalize_query(text))
+        if token not in FILLER_WORDS
+    ]
+
+
+def term_key(text: str) -> str:
+    """Match key: two terms match when they have the same key terms"""
+    return " ".join(sorted(set(key_terms(text))))
+
+
+def prefetch_term(query: str) -> Optional[str]:
+    """Search term to prefetch for ``query``, or None when it is too long"""
+    terms = key_terms(query)
+    if not terms or len(terms) > PREFETCH_MAX_TERMS:
+        return None
+    return " ".join(terms)
+
+
+class Prefetch:
+    """One in-flight speculative lookup, consumed by the first research step"""
+
+    def __init__(self, term: str):
+        self.term = term
+        self.key = term_key(term)
+        self.task = asyncio.ensure_future(awiki_search(term))
+        # A failed lookup that nobody awaits must not log "never retrieved"
+        self.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        self.outcome: Optional[str] = None
+
+    def take(self, terms: list[str]) -> Optional[int]:
+        """Index of the term the prefetch answers; either way it is used up"""
+        if self.outcome is not None:
+            return None
+        for i, term in enumerate(terms):
+            if term_key(term) == self.key:
+                self._finish("hit", planner_term=term)
+                return i
+        self._finish("miss", planner_terms=terms)
+        return None
+
+    def _finish(self, outcome: str, **fields) -> None:
+        self.outcome = outcome
+        if outcome != "hit":
+            self.task.cancel()
+        WIKI_PREFETCH.inc(outcome=outcome)
+        log_event(logger, "wiki_prefetch", outcome=outcome, term=self.term, **fields)
+
+    def close(self) -> None:
+        if self.outcome is None:
+            # The run never researched (fast path, history, budget)
+            self._finish("unused")
+
+
+_prefetch: ContextVar[Optional[Prefetch]] = ContextVar("wiki_prefetch", default=None)
+
+
+@contextmanager
+def speculative_prefetch(query: str):
+    """Prefetch ``query``'s key terms for the runs started inside this block"""
+    term = prefetch_term(query) if PREFETCH_WIKI else None
+    if term is None:
+        yield None
+        return
+    prefetch = Prefetch(term)
+    token = _prefetch.set(prefetch)
+    try:
+        yield prefetch
+    finally:
+        _prefetch.reset(token)
+        prefetch.close()
+
+
+async def asearch_with_prefetch(terms: list[str]) -> list[str]:
+    """``awiki_search_many`` that answers a matching term from the prefetch"""
+    prefetch = _prefetch.get()
+    hit = prefetch.take(terms) if prefetch is not None else None
+    if hit is None:
+        return await awiki_search_many(terms)
+    rest = terms[:hit] + terms[hit + 1 :]
+    prefetched, results = await asyncio.gather(
+        _prefetched(prefetch, terms[hit]), awiki_search_many(rest)
+    )
+    results.insert(hit, prefetched)
+    return results
+
+
+async def _prefetched(prefetch: Prefetch, term: str) -> str:
+    """The prefetched result; a failed speculation is dropped and ``term``
+    searched as usual"""
+    try:
+        return await prefetch.task
+    except Exception as e:
+        log_event(
+            logger,
+            "wiki_prefetch_failed",
+            level=logging.WARNING,
+            term=prefetch.term,
+            error=str(e),
+        )
+        return await awiki_search(term)
@@ -0,0 +1,132 @@
+import logging
+import os
+import threading
+from functools import lru_cache
+
+import tiktoken
+from observability import LLM_PROMPT_TOKENS, log_event
+
+from tools.wiki_cache import is_negative_result
+
+RESEARCH_PREFIX = "Researcher found:"
+
+# Per-node prompt budgets in tokens (override with PROMPT_BUDGET_<NODE>)
+NODE_BUDGETS = {
+    "planner": int(os.getenv("PROMPT_BUDGET_PLANNER", 4000)),
+    "summarizer": int(os.getenv("PROMPT_BUDGET_SUMMARIZER", 8000)),
+    "examiner": int(os.getenv("PROMPT_BUDGET_EXAMINER", 6000)),
+    "history": int(os.getenv("PROMPT_BUDGET_HISTORY", 6000)),
+}
+# Older research entries are cut down to this many tokens before being dropped
+RESEARCH_ENTRY_FLOOR = int(os.getenv("PROMPT_RESEARCH_ENTRY_FLOOR", 300))
+# Tokens reserved for the fixed instructions of each prompt template
+TEMPLATE_RESERVE = 700
+
+logger = logging.getLogger(__name__)
+_usage_lock = threading.Lock()
+prompt_token_usage: dict[str, dict[str, int]] = {}
+
+
+# Rough chars-per-token ratio used when tiktoken's BPE files cannot be loaded
+APPROX_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        try:
+            return tiktoken.encoding_for_model("gpt-4.1-mini")
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use; offline hosts fall back
+        log_event(
+            logger, "tiktoken_unavailable", level=logging.WARNING, error=str(e)
+        )
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return -(-len(text) // APPROX_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    encoding = _encoding()
+    if encoding is None:
+        max_chars = max_tokens * APPROX_CHARS_PER_TOKEN
+        return text if len(text) <= max_chars else text[:max_chars] + " ...[truncated]"
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]) + " ...[truncated]"
+
+
+def section_budget(node: str, *fixed_sections: str) -> int:
+    """Tokens left for variable sections after the template and fixed sections"""
+    used = TEMPLATE_RESERVE + sum(count_tokens(section) for section in fixed_sections)
+    return max(NODE_BUDGETS[node] - used, 0)
+
+
+def compact_memory(memory: list[str], budget: int) -> list[str]:
+    """Shrink ``memory`` to roughly ``budget`` tokens, keeping its order.
+
+    Non-research entries (planner terms, history answers, summaries) are short
+    and kept. Research entries are compacted oldest first: failed lookups are
+    dropped, then entries are truncated to ``RESEARCH_ENTRY_FLOOR`` tokens,
+    then dropped. The newest research entry is only ever truncated.
+    """
+    sizes = [count_tokens(entry) for entry in memory]
+    total = sum(sizes)
+    if total <= budget:
+        return list(memory)
+
+    entries = list(memory)
+    research = [i for i, e in enumerate(entries) if e.startswith(RESEARCH_PREFIX)]
+    older = research[:-1]
+
+    for i in older:
+        if total <= budget:
+            break
+        if is_negative_result(entries[i]):
+            total -= sizes[i]
+            entries[i], sizes[i] = None, 0
+
+    for i in older:
+        if total <= budget:
+            break
+        if entries[i] is not None and sizes[i] > RESEARCH_ENTRY_FLOOR:
+            entries[i] = truncate_tokens(entries[i], RESEARCH_ENTRY_FLOOR)
+            total += count_tokens(entries[i]) - sizes[i]
+            sizes[i] = count_tokens(entries[i])
+
+    for i in older:
+        if total <= budget:
+            break
+        if entries[i] is not None:
+            total -= sizes[i]
+            entries[i], sizes[i] = None, 0
+
+    if total > budget and research:
+        newest = research[-1]
+        room = max(budget - (total - sizes[newest]), RESEARCH_ENTRY_FLOOR)
+        entries[newest] = truncate_tokens(entries[newest], room)
+
+    return [entry for entry in entries if entry is not None]
+
+
+def record_prompt_tokens(node: str, prompt: str) -> int:
+    """Count the tokens actually sent for ``node`` and add them to the totals"""
+    tokens = count_tokens(prompt)
+    with _usage_lock:
+        usage = prompt_token_usage.setdefault(node, {"calls": 0, "tokens": 0})
+        usage["calls"] += 1
+        usage["tokens"] += tokens
+        usage["last"] = tokens
+    LLM_PROMPT_TOKENS.inc(tokens, node=node)
+    log_event(
+        logger, "prompt_tokens", node=node, tokens=tokens, budget=NODE_BUDGETS.get(node)
+    )
+    return tokens
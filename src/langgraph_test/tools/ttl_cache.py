@@ -0,0 +1,177 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+class TTLCache:
+    """Two-tier (in-process LRU + optional SQLite) key/value cache with TTLs.
+
+    ``aget``/``aset`` serve the memory tier inline and run the SQLite tier in
+    a worker thread, so async callers never block the event loop on disk I/O.
+    The two tiers have separate locks, so a memory lookup never waits for a
+    disk write. Expired and least recently used rows are evicted every
+    ``evict_every`` writes rather than on each one.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        path: Optional[str] = None,
+        ttl: float = 7 * 24 * 3600,
+        max_memory_entries: int = 1024,
+        max_disk_entries: int = 50_000,
+        evict_every: Optional[int] = None,
+    ):
+        self.table = table
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        # The disk tier may overshoot its limit by this many rows
+        self.evict_every = evict_every or max(1, min(1000, max_disk_entries // 100))
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._writes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_accessed "
+                f"ON {table} (accessed_at)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        result = self._get_memory(key)
+        if result is None and self._conn is not None:
+            result = self._get_disk(key)
+        if result is None:
+            self._miss()
+        return result
+
+    async def aget(self, key: str) -> Optional[str]:
+        """``get`` with the SQLite lookup in a worker thread"""
+        result = self._get_memory(key)
+        if result is None and self._conn is not None:
+            result = await asyncio.to_thread(self._get_disk, key)
+        if result is None:
+            self._miss()
+        return result
+
+    def set(self, key: str, result: str, ttl: Optional[float] = None) -> None:
+        now, expires_at = self._expiry(ttl)
+        with self._lock:
+            self._remember(key, result, expires_at)
+        if self._conn is not None:
+            self._set_disk(key, result, expires_at, now)
+
+    async def aset(self, key: str, result: str, ttl: Optional[float] = None) -> None:
+        """``set`` with the SQLite write in a worker thread"""
+        now, expires_at = self._expiry(ttl)
+        with self._lock:
+            self._remember(key, result, expires_at)
+        if self._conn is not None:
+            await asyncio.to_thread(self._set_disk, key, result, expires_at, now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._conn is not None:
+            with self._disk_lock:
+                self._conn.execute(f"DELETE FROM {self.table}")
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def _expiry(self, ttl: Optional[float]) -> tuple[float, float]:
+        now = time.time()
+        return now, now + (self.ttl if ttl is None else ttl)
+
+    def _miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is None:
+                return None
+            result, expires_at = cached
+            if expires_at <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._disk_lock:
+            row = self._conn.execute(
+                f"SELECT result, expires_at FROM {self.table} WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or row[1] <= now:
+                return None
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                (now, key),
+            )
+            self._conn.commit()
+        with self._lock:
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            self.disk_hits += 1
+        return row[0]
+
+    def _set_disk(self, key: str, result: str, expires_at: float, now: float) -> None:
+        with self._disk_lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                (key, result, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes >= self.evict_every:
+                self._writes = 0
+                self._evict_disk(now)
+            self._conn.commit()
+
+    def _remember(self, key: str, result: str, expires_at: float) -> None:
+        self._memory[key] = (result, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float) -> None:
+        self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
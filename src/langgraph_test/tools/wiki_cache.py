@@ -0,0 +1,52 @@
+import os
+import re
+from typing import Optional
+
+from tools.ttl_cache import TTLCache
+
+NO_RESULT_MARKERS = ("No relevant result", "No good Wikipedia Search Result")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search term so trivially different spellings share a cache key"""
+    query = query.strip().strip("'\"[]").lower()
+    query = re.sub(r"[^\w\s-]", " ", query)
+    return " ".join(query.split())
+
+
+def is_negative_result(result: str) -> bool:
+    return any(marker in result for marker in NO_RESULT_MARKERS)
+
+
+class WikiCache(TTLCache):
+    """Cache for Wikipedia lookups keyed on the normalized search term"""
+
+    def __init__(
+        self, path: Optional[str] = None, negative_ttl: float = 3600, **kwargs
+    ):
+        super().__init__("wiki_cache", path=path, **kwargs)
+        self.negative_ttl = negative_ttl
+
+    def get(self, query: str) -> Optional[str]:
+        return super().get(normalize_query(query))
+
+    async def aget(self, query: str) -> Optional[str]:
+        return await super().aget(normalize_query(query))
+
+    def set(self, query: str, result: str) -> None:
+        super().set(normalize_query(query), result, ttl=self._result_ttl(result))
+
+    async def aset(self, query: str, result: str) -> None:
+        await super().aset(normalize_query(query), result, ttl=self._result_ttl(result))
+
+    def _result_ttl(self, result: str) -> float:
+        return self.negative_ttl if is_negative_result(result) else self.ttl
+
+
+wiki_cache = WikiCache(
+    path=os.getenv("WIKI_CACHE_PATH", "cache/wiki_cache.sqlite3") or None,
+    ttl=float(os.getenv("WIKI_CACHE_TTL", 7 * 24 * 3600)),
+    negative_ttl=float(os.getenv("WIKI_CACHE_NEGATIVE_TTL", 3600)),
+    max_memory_entries=int(os.getenv("WIKI_CACHE_MEMORY_ENTRIES", 1024)),
+    max_disk_entries=int(os.getenv("WIKI_CACHE_DISK_ENTRIES", 50_000)),
+)
@@ -0,0 +1,190 @@
+"""
+Pooled MediaWiki API client for ``wiki_search``.
+
+Replaces ``WikipediaAPIWrapper``, which searches and then downloads each of the
+top pages one after another over fresh connections. Here a single
+``generator=search`` query returns the top-k pages together with their intro
+extracts, capped at ``WIKI_EXTRACT_CHARS``, over keep-alive connections. Pages
+whose extract did not fit in that response are fetched with multi-title
+``titles=A|B|C`` queries, in parallel. Results keep the ``Page:/Summary:``
+format of ``WikipediaQueryRun``.
+
+``WIKI_API_URL`` points the client at another endpoint, e.g. the stub server
+in ``benchmarks/wiki_stub.py``.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+
+from tools.http_pools import LoopClients
+from tools.local_wiki import NO_RESULT
+
+WIKI_LANG = os.getenv("WIKI_LANG", "en")
+WIKI_API_URL = os.getenv("WIKI_API_URL", f"https://{WIKI_LANG}.wikipedia.org/w/api.php")
+WIKI_TOP_K = int(os.getenv("WIKI_TOP_K", 3))
+# TextExtracts caps intro extracts at 1200 characters
+WIKI_EXTRACT_CHARS = min(int(os.getenv("WIKI_EXTRACT_CHARS", 1200)), 1200)
+WIKI_TIMEOUT = float(os.getenv("WIKI_TIMEOUT", 10))
+WIKI_MAX_CONNECTIONS = int(os.getenv("WIKI_MAX_CONNECTIONS", 20))
+WIKI_USER_AGENT = os.getenv(
+    "WIKI_USER_AGENT", "langgraph-research-agent/0.1 (wiki_search tool)"
+)
+DOC_CONTENT_CHARS_MAX = 4000
+MAX_QUERY_LENGTH = 300
+# Titles per extracts request (the API's limit for intro extracts)
+TITLES_PER_REQUEST = 20
+
+
+class WikipediaClient:
+    """``invoke``/``ainvoke`` a search term, answered like ``WikipediaQueryRun``"""
+
+    def __init__(
+        self,
+        api_url: str = WIKI_API_URL,
+        top_k: int = WIKI_TOP_K,
+        extract_chars: int = WIKI_EXTRACT_CHARS,
+    ):
+        self.api_url = api_url
+        self.top_k = top_k
+        self.extract_chars = extract_chars
+        self._client: Optional[httpx.Client] = None
+        # One async pool per event loop; pooled connections belong to their loop
+        self._async_clients = LoopClients(
+            lambda: httpx.AsyncClient(**self._client_options())
+        )
+        self._lock = threading.Lock()
+
+    def _client_options(self) -> dict:
+        return {
+            "limits": httpx.Limits(
+                max_connections=WIKI_MAX_CONNECTIONS,
+                max_keepalive_connections=WIKI_MAX_CONNECTIONS,
+            ),
+            "timeout": WIKI_TIMEOUT,
+            "headers": {"User-Agent": WIKI_USER_AGENT},
+        }
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._client_options())
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        return self._async_clients.get()
+
+    def _extract_params(self) -> dict:
+        return {
+            "action": "query",
+            "format": "json",
+            "formatversion": "2",
+            "prop": "extracts|pageprops",
+            "exintro": "1",
+            "explaintext": "1",
+            "exchars": str(self.extract_chars),
+            "exlimit": "max",
+            "ppprop": "disambiguation",
+            "redirects": "1",
+        }
+
+    def _search_params(self, query: str) -> dict:
+        return {
+            **self._extract_params(),
+            "generator": "search",
+            "gsrsearch": query[:MAX_QUERY_LENGTH],
+            "gsrlimit": str(self.top_k),
+            "gsrnamespace": "0",
+        }
+
+    def _titles_params(self, titles: list[str]) -> dict:
+        return {**self._extract_params(), "titles": "|".join(titles)}
+
+    @staticmethod
+    def _pages(payload: dict) -> list[dict]:
+        """Result pages in search rank order, without disambiguation pages"""
+        pages = payload.get("query", {}).get("pages", [])
+        pages = [
+            page
+            for page in pages
+            if not page.get("missing")
+            and "disambiguation" not in page.get("pageprops", {})
+        ]
+        return sorted(pages, key=lambda page: page.get("index", 0))
+
+    def _chunks(self, titles: list[str]) -> list[list[str]]:
+        return [
+            titles[i : i + TITLES_PER_REQUEST]
+            for i in range(0, len(titles), TITLES_PER_REQUEST)
+        ]
+
+    @staticmethod
+    def _format(pages: list[dict], extracts: dict[str, str]) -> str:
+        summaries = [
+            f"Page: {page['title']}\nSummary: {extracts[page['title']]}"
+            for page in pages
+            if extracts.get(page["title"])
+        ]
+        if not summaries:
+            return NO_RESULT
+        return "\n\n".join(summaries)[:DOC_CONTENT_CHARS_MAX]
+
+    def _get(self, params: dict) -> dict:
+        response = self.client.get(self.api_url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def _aget(self, params: dict) -> dict:
+        response = await self.async_client.get(self.api_url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def extracts(self, titles: list[str]) -> dict[str, str]:
+        """Intro extracts of ``titles``, batched per request and fetched in parallel"""
+        chunks = self._chunks(titles)
+        if not chunks:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            payloads = executor.map(
+                lambda chunk: self._get(self._titles_params(chunk)), chunks
+            )
+            return {
+                page["title"]: page.get("extract", "")
+                for payload in payloads
+                for page in self._pages(payload)
+            }
+
+    async def aextracts(self, titles: list[str]) -> dict[str, str]:
+        """Async variant of ``extracts``"""
+        payloads = await asyncio.gather(
+            *(self._aget(self._titles_params(chunk)) for chunk in self._chunks(titles))
+        )
+        return {
+            page["title"]: page.get("extract", "")
+            for payload in payloads
+            for page in self._pages(payload)
+        }
+
+    def invoke(self, query: str) -> str:
+        pages = self._pages(self._get(self._search_params(query)))
+        extracts = {page["title"]: page.get("extract", "") for page in pages}
+        # Pages past the extracts limit of one response come back without text
+        missing = [title for title, text in extracts.items() if not text]
+        if missing:
+            extracts.update(self.extracts(missing))
+        return self._format(pages, extracts)
+
+    async def ainvoke(self, query: str) -> str:
+        pages = self._pages(await self._aget(self._search_params(query)))
+        extracts = {page["title"]: page.get("extract", "") for page in pages}
+        missing = [title for title, text in extracts.items() if not text]
+        if missing:
+            extracts.update(await self.aextracts(missing))
+        return self._format(pages, extracts)
@@ -1,12 +1,115 @@
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.utilities import WikipediaAPIWrapper
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
 from langchain.tools import tool
+from observability import WIKI_DURATION, span
+
+from tools.local_wiki import FallbackWiki, LocalWikiIndex
+from tools.wiki_client import WikipediaClient
+from tools.wiki_cache import normalize_query, wiki_cache
+
+
+def build_wiki_backend():
+    """Pick the search backend from WIKI_BACKEND: ``api``, ``local`` or ``local+api``"""
+    backend = os.getenv("WIKI_BACKEND", "api")
+    api = WikipediaClient()
+    if backend == "api":
+        return api
+    local = LocalWikiIndex(os.getenv("WIKI_INDEX_DIR", "wiki_index"))
+    if backend == "local":
+        return local
+    if backend == "local+api":
+        return FallbackWiki(local, api)
+    raise ValueError(f"Unknown WIKI_BACKEND: {backend}")
+
 
-wiki = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper(top_k_results=3, lang="en"))
+wiki = build_wiki_backend()
+
+RESEARCH_CONCURRENCY = int(os.getenv("RESEARCH_CONCURRENCY", 4))
+
+_shared_lookups: ContextVar[Optional[dict[str, asyncio.Future]]] = ContextVar(
+    "shared_lookups", default=None
+)
 
 
 @tool
 def wiki_search(query: str) -> str:
     """Search Wikipedia for a given query."""
-    result = wiki.invoke(query)
-    return result
\ No newline at end of file
+    start = time.perf_counter()
+    cached = wiki_cache.get(query)
+    if cached is not None:
+        WIKI_DURATION.observe(time.perf_counter() - start, source="cache")
+        return cached
+    with span("wiki", query):
+        result = wiki.invoke(query)
+    wiki_cache.set(query, result)
+    WIKI_DURATION.observe(time.perf_counter() - start, source="api")
+    return result
+
+
+@contextmanager
+def shared_lookups():
+    """Inside this block, and tasks started from it, identical lookups run once.
+
+    Used by batch runs so concurrent queries that research the same
+    (normalized) term share one in-flight Wikipedia request.
+    """
+    token = _shared_lookups.set({})
+    try:
+        yield
+    finally:
+        _shared_lookups.reset(token)
+
+
+async def awiki_search(query: str) -> str:
+    """Async variant of ``wiki_search`` sharing the same cache."""
+    shared = _shared_lookups.get()
+    if shared is None:
+        return await _awiki_search(query)
+    key = normalize_query(query)
+    if key not in shared:
+        shared[key] = asyncio.ensure_future(_awiki_search(query))
+    # Shielded so one cancelled waiter does not cancel the lookup for the others
+    return await asyncio.shield(shared[key])
+
+
+async def _awiki_search(query: str) -> str:
+    start = time.perf_counter()
+    cached = await wiki_cache.aget(query)
+    if cached is not None:
+        WIKI_DURATION.observe(time.perf_counter() - start, source="cache")
+        return cached
+    with span("wiki", query):
+        result = await wiki.ainvoke(query)
+    await wiki_cache.aset(query, result)
+    WIKI_DURATION.observe(time.perf_counter() - start, source="api")
+    return result
+
+
+def wiki_search_many(
+    queries: list[str], max_workers: int = RESEARCH_CONCURRENCY
+) -> list[str]:
+    """Search several terms concurrently, returning results in the order given"""
+    if not queries:
+        return []
+    workers = max(1, min(max_workers, len(queries)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(wiki_search.invoke, queries))
+
+
+async def awiki_search_many(
+    queries: list[str], max_concurrency: int = RESEARCH_CONCURRENCY
+) -> list[str]:
+    """Async variant of ``wiki_search_many`` bounded by a semaphore"""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def search(query: str) -> str:
+        async with semaphore:
+            return await awiki_search(query)
+
+    return list(await asyncio.gather(*(search(query) for query in queries)))